@@ -1,9 +1,11 @@
 from django.apps import apps
 from django.utils.translation import gettext_lazy as _
+from django.utils.dateparse import parse_datetime
 from django.utils.timezone import now
 from django.contrib.contenttypes.models import ContentType
 
-from activity import settings
+from activity import follow_cache, follow_counts, routers, settings, timelines, typed_ids
+from activity.gfk import GFKResolver
 from activity.signals import action
 from activity.registry import check
 
@@ -35,8 +37,15 @@ def follow(user, obj, send_action=True, actor_only=True, flag='', **kwargs):
     instance, created = apps.get_model('activity', 'follow').objects.get_or_create(
         user=user, object_id=obj.pk, flag=flag,
         content_type=ContentType.objects.get_for_model(obj),
-        actor_only=actor_only
+        actor_only=actor_only, defaults=typed_ids.values('object', obj)
     )
+    if created:
+        follow_cache.invalidate_follow(user, obj, flag)
+        routers.pin(user)
+    if settings.USE_FOLLOW_COUNTS and created:
+        follow_counts.followed(user, obj, flag)
+    if settings.USE_TIMELINES and created:
+        timelines.follow(user, obj, actor_only=actor_only)
     if send_action and created:
         if not flag:
             action.send(user, verb=_('started following'), target=obj, **kwargs)
@@ -60,14 +69,24 @@ def unfollow(user, obj, send_action=False, flag=''):
         unfollow(request.user, other_user, flag='watching')
     """
     check(obj)
+    # the flags and counts below must be read from the primary
+    routers.pin(user)
     qs = apps.get_model('activity', 'follow').objects.filter(
-        user=user, object_id=obj.pk,
-        content_type=ContentType.objects.get_for_model(obj)
+        user=user, content_type=ContentType.objects.get_for_model(obj),
+        **typed_ids.object_lookup('object', obj)
     )
 
     if flag:
         qs = qs.filter(flag=flag)
+    flags = list(qs.values_list('flag', flat=True)) if settings.FOLLOW_CACHE else []
+    if settings.USE_FOLLOW_COUNTS:
+        follow_counts.removed(qs)
     qs.delete()
+    for flag_removed in flags:
+        follow_cache.invalidate_follow(user, obj, flag_removed)
+
+    if settings.USE_TIMELINES and not is_following(user, obj):
+        timelines.unfollow(user, obj)
 
     if send_action:
         if not flag:
@@ -91,9 +110,12 @@ def is_following(user, obj, flag=''):
     """
     check(obj)
 
+    if settings.FOLLOW_CACHE:
+        return follow_cache.is_following_many(user, [obj], flag=flag)[0]
+
     qs = apps.get_model('activity', 'follow').objects.filter(
-        user=user, object_id=obj.pk,
-        content_type=ContentType.objects.get_for_model(obj)
+        user=user, content_type=ContentType.objects.get_for_model(obj),
+        **typed_ids.object_lookup('object', obj)
     )
 
     if flag:
@@ -102,22 +124,26 @@ def is_following(user, obj, flag=''):
     return qs.exists()
 
 
-def action_handler(verb, **kwargs):
+def untranslated(verb):
     """
-    Handler function to create Action instance upon action signal call.
+    Returns the original string of a gettext_lazy verb.
     """
-    kwargs.pop('signal', None)
-    actor = kwargs.pop('sender')
-
     # We must store the untranslated string
     # If verb is an ugettext_lazyed string, fetch the original string
     if hasattr(verb, '_proxy____args'):
-        verb = verb._proxy____args[0]
+        return verb._proxy____args[0]
+    return verb
+
 
+def build_action(verb, actor, _check=check, **kwargs):
+    """
+    Returns an unsaved Action instance for the arguments of an action signal.
+    """
     newaction = apps.get_model('activity', 'action')(
         actor_content_type=ContentType.objects.get_for_model(actor),
         actor_object_id=actor.pk,
-        verb=str(verb),
+        **typed_ids.values('actor_object', actor),
+        verb=str(untranslated(verb)),
         public=bool(kwargs.pop('public', True)),
         description=kwargs.pop('description', None),
         timestamp=kwargs.pop('timestamp', now())
@@ -126,11 +152,129 @@ def action_handler(verb, **kwargs):
     for opt in ('target', 'action_object'):
         obj = kwargs.pop(opt, None)
         if obj is not None:
-            check(obj)
+            _check(obj)
             setattr(newaction, '%s_object_id' % opt, obj.pk)
             setattr(newaction, '%s_content_type' % opt,
                     ContentType.objects.get_for_model(obj))
+            for field, value in typed_ids.values('%s_object' % opt, obj).items():
+                setattr(newaction, field, value)
     if settings.USE_JSONFIELD and len(kwargs):
         newaction.data = kwargs
+    return newaction
+
+
+def action_handler(verb, **kwargs):
+    """
+    Handler function to create Action instance upon action signal call.
+
+    With ``ACTIVITY_SETTINGS['ASYNC']`` enabled the action is serialized and
+    created by a Celery task once the current transaction commits, nothing
+    is returned.
+    """
+    kwargs.pop('signal', None)
+    routers.pin_actor(kwargs['sender'])
+    if settings.ASYNC:
+        from activity.tasks import queue_action
+        kwargs.setdefault('timestamp', now())
+        return queue_action(serialize_action(verb, **kwargs))
+
+    actor = kwargs.pop('sender')
+    newaction = build_action(verb, actor, **kwargs)
     newaction.save(force_insert=True)
+    if settings.USE_TIMELINES:
+        timelines.fan_out(newaction)
     return newaction
+
+
+def send_many(actions, batch_size=None):
+    """
+    Creates many actions at once.
+
+    ``actions`` is an iterable of dictionaries of the arguments of
+    ``action.send``, with the actor under ``sender``. Each model is checked
+    against the registry once and the actions are inserted with
+    ``bulk_create``, ``batch_size`` rows at a time (defaults to
+    ``ACTIVITY_SETTINGS['BULK_BATCH_SIZE']``). Content types come from the
+    ``ContentType`` cache, so they are only looked up once per model.
+
+    Unlike ``action.send`` no signal is dispatched, other receivers of the
+    action signal are not called.
+
+    Returns the created ``Action`` instances.
+
+    Example::
+
+        send_many([
+            {'sender': request.user, 'verb': 'ordered', 'action_object': order}
+            for order in orders
+        ])
+    """
+    checked = set()
+
+    def check_once(obj):
+        if obj.__class__ not in checked:
+            check(obj)
+            checked.add(obj.__class__)
+
+    batch_size = batch_size or settings.BULK_BATCH_SIZE
+    manager = apps.get_model('activity', 'action').objects
+    created, batch = [], []
+    for kwargs in actions:
+        kwargs = dict(kwargs)
+        actor = kwargs.pop('sender')
+        check_once(actor)
+        batch.append(build_action(kwargs.pop('verb'), actor, _check=check_once, **kwargs))
+        if len(batch) == batch_size:
+            created.extend(manager.bulk_create(batch))
+            batch = []
+    if batch:
+        created.extend(manager.bulk_create(batch))
+
+    if settings.USE_TIMELINES:
+        for newaction in created:
+            timelines.fan_out(newaction)
+    return created
+
+
+OBJECT_ARGUMENTS = ('sender', 'target', 'action_object')
+
+
+def serialize_action(verb, **kwargs):
+    """
+    Returns a JSON serializable dictionary of the arguments of an action signal,
+    objects are replaced by their ``[content type id, pk]``.
+    """
+    kwargs.pop('signal', None)
+    payload = {'verb': str(untranslated(verb))}
+    for key, value in kwargs.items():
+        if key in OBJECT_ARGUMENTS and value is not None:
+            value = [ContentType.objects.get_for_model(value).pk, value.pk]
+        elif key == 'timestamp':
+            value = value.isoformat()
+        payload[key] = value
+    return payload
+
+
+def deserialize_actions(payloads):
+    """
+    Yields the arguments of the action signals serialized by ``serialize_action``,
+    fetching their objects with one query per content type. Actions whose
+    objects no longer exist are skipped.
+    """
+    resolver = GFKResolver()
+    resolver.fetch({
+        (payload[key][0], str(payload[key][1]))
+        for payload in payloads for key in OBJECT_ARGUMENTS
+        if payload.get(key) is not None
+    })
+    for payload in payloads:
+        kwargs = dict(payload)
+        for key in OBJECT_ARGUMENTS:
+            if kwargs.get(key) is not None:
+                kwargs[key] = resolver.objects.get((kwargs[key][0], str(kwargs[key][1])))
+                if kwargs[key] is None:
+                    break
+        else:
+            if 'timestamp' in kwargs:
+                kwargs['timestamp'] = parse_datetime(kwargs['timestamp'])
+            yield kwargs
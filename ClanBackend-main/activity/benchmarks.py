@@ -0,0 +1,209 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+from statistics import median, quantiles
+from time import perf_counter
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from activity import typed_ids
+
+
+def create_actors(count, prefix='benchmark'):
+    """
+    Bulk creates ``count`` users to act in the generated actions.
+    """
+    User = get_user_model()
+    fields = {User.USERNAME_FIELD, *User.REQUIRED_FIELDS}
+
+    def value(field, i):
+        if 'email' in field:
+            return f'{prefix}{i}@example.com'
+        return f'{prefix}{i}'
+
+    User.objects.bulk_create([
+        User(**{field: value(field, i) for field in fields}) for i in range(count)
+    ], batch_size=1000)
+    lookup = {f'{User.USERNAME_FIELD}__startswith': prefix}
+    return list(User._default_manager.filter(**lookup))
+
+
+def skewed(population, skew=1.0):
+    """
+    Returns a function picking items of ``population`` with Zipf-like
+    probabilities, the first items being the most popular.
+    A ``skew`` of 0 picks uniformly.
+    """
+    weights = list(accumulate(1 / (rank ** skew) for rank in range(1, len(population) + 1)))
+
+    def choice():
+        return random.choices(population, cum_weights=weights)[0]
+    return choice
+
+
+def seed_actions(actors, count, batch_size=10000, public_ratio=0.9, span=timedelta(days=365), skew=0):
+    """
+    Bulk inserts ``count`` actions between random pairs of the given actors,
+    spread over ``span`` up to now. With a ``skew`` the first actors act the most.
+    """
+    Action = apps.get_model('activity', 'action')
+    ctype = ContentType.objects.get_for_model(actors[0])
+    choice = skewed(actors, skew)
+    latest = now()
+    batch = []
+    for _ in range(count):
+        actor, target = choice(), random.choice(actors)
+        batch.append(Action(
+            actor_content_type=ctype,
+            actor_object_id=actor.pk,
+            **typed_ids.values('actor_object', actor),
+            verb='benchmarked',
+            target_content_type=ctype,
+            target_object_id=target.pk,
+            **typed_ids.values('target_object', target),
+            public=random.random() < public_ratio,
+            timestamp=latest - span * random.random(),
+        ))
+        if len(batch) == batch_size:
+            Action.objects.bulk_create(batch)
+            batch = []
+    Action.objects.bulk_create(batch)
+
+
+def seed_follows(users, count, batch_size=10000, skew=1.0):
+    """
+    Bulk inserts up to ``count`` follows between the given users, the number of
+    followers of each user following a Zipf-like distribution so a few users
+    have most of the followers. Duplicate pairs are skipped.
+    """
+    Follow = apps.get_model('activity', 'follow')
+    ctype = ContentType.objects.get_for_model(users[0])
+    choice = skewed(users, skew)
+    batch = []
+    for _ in range(count):
+        user, followed = random.choice(users), choice()
+        batch.append(Follow(
+            user=user,
+            content_type=ctype,
+            object_id=followed.pk,
+            **typed_ids.values('object', followed),
+            actor_only=random.random() < 0.8,
+        ))
+        if len(batch) == batch_size:
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def analyze(*models):
+    """
+    Refreshes the planner statistics of the given models' tables on PostgreSQL.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute('ANALYZE %s' % connection.ops.quote_name(model._meta.db_table))
+
+
+def measure(func, repeat=10):
+    """
+    Calls ``func`` ``repeat`` times.
+    Returns the latency percentiles in milliseconds and the number of SQL queries per call.
+    """
+    timings = []
+    with CaptureQueriesContext(connection) as context:
+        for _ in range(repeat):
+            started = perf_counter()
+            func()
+            timings.append((perf_counter() - started) * 1000)
+    percentiles = quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return {
+        'p50': median(timings),
+        'p95': percentiles[94],
+        'p99': percentiles[98],
+        'queries': len(context) / repeat,
+    }
+
+
+def get_scenarios(user, page_size=30):
+    """
+    Returns the hot paths of the activity app as a dictionary of names to
+    callables reading a page for ``user``: the streams, the follow lookups,
+    the feeds and the DRF stream actions. ``feeds.format`` only formats a page
+    of actions with a FeedContext, ``feeds.format.uncached`` makes the site,
+    content type and URL lookups for each item instead.
+    """
+    from activity import feeds
+    from activity.drf.views import ActionViewSet, FollowViewSet
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    Action = apps.get_model('activity', 'action')
+    Follow = apps.get_model('activity', 'follow')
+    User = get_user_model()
+    ctype = ContentType.objects.get_for_model(User)
+    followed = list(User._default_manager.order_by('pk')[:50])
+
+    def page(stream):
+        return lambda: list(stream()[:page_size])
+
+    def view(view_func, *args, **kwargs):
+        def call():
+            request = RequestFactory().get('/', {'limit': page_size})
+            request.user = user
+            response = view_func(request, *args, **kwargs)
+            if response.streaming:
+                return b''.join(response.streaming_content)
+            return response.content
+        return call
+
+    def format_page(feed_context):
+        # formatting only: the page is read and resolved once, outside of the timings
+        actions = list(Action.objects.model_actions(User)[:page_size])
+        feed = feeds.JSONActivityFeed()
+
+        def call():
+            feed.feed_context = feeds.FeedContext() if feed_context else None
+            return [feed.format(action) for action in actions]
+        return call
+
+    def drf(viewset, action, **kwargs):
+        def call():
+            request = APIRequestFactory().get('/')
+            force_authenticate(request, user=user)
+            return viewset.as_view({'get': action})(request, **kwargs).render()
+        return call
+
+    return {
+        'streams.actor': page(lambda: Action.objects.actor(user)),
+        'streams.target': page(lambda: Action.objects.target(user)),
+        'streams.action_object': page(lambda: Action.objects.action_object(user)),
+        'streams.any': page(lambda: Action.objects.any(user)),
+        'streams.model_actions': page(lambda: Action.objects.model_actions(User)),
+        'streams.user': page(lambda: Action.objects.user(user, with_user_activity=True)),
+        'follows.is_following': lambda: Follow.objects.is_following(user, followed[-1]),
+        'follows.is_following_many': lambda: Follow.objects.is_following_many(user, followed),
+        'follows.followers': lambda: list(Follow.objects.followers(followed[0])[:page_size]),
+        'follows.following': lambda: Follow.objects.following(user, User),
+        'feeds.atom.user': view(feeds.AtomUserActivityFeed()),
+        'feeds.atom.model': view(feeds.AtomModelActivityFeed(), ctype.pk),
+        'feeds.atom.object': view(feeds.AtomObjectActivityFeed(), ctype.pk, user.pk),
+        'feeds.json.user': view(feeds.UserJSONActivityFeed.as_view()),
+        'feeds.json.model': view(feeds.ModelJSONActivityFeed.as_view(), content_type_id=ctype.pk),
+        'feeds.json.object': view(feeds.ObjectJSONActivityFeed.as_view(),
+                                  content_type_id=ctype.pk, object_id=user.pk),
+        'feeds.format': format_page(True),
+        'feeds.format.uncached': format_page(False),
+        'drf.actions.my_actions': drf(ActionViewSet, 'my_actions'),
+        'drf.actions.following': drf(ActionViewSet, 'following'),
+        'drf.actions.model_stream': drf(ActionViewSet, 'model_stream', content_type_id=ctype.pk),
+        'drf.actions.any_stream': drf(ActionViewSet, 'any_stream',
+                                      content_type_id=ctype.pk, object_id=user.pk),
+        'drf.follows.following': drf(FollowViewSet, 'following'),
+    }
@@ -0,0 +1,33 @@
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+
+from clan.pagination import KeysetPagination
+
+
+class ActionCursorPagination(KeysetPagination):
+    """
+    Keyset pagination for action streams on ``(timestamp, id)``.
+    Pages are fetched with an indexed range condition instead of an OFFSET
+    and no COUNT query is issued.
+    """
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -1,9 +1,10 @@
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 from generic_relations.relations import GenericRelatedField
 
 from activity.models import Follow, Action
 from activity.registry import registry, label
-from activity.settings import DRF_SETTINGS, import_obj
+from activity.settings import DRF_SETTINGS, USE_FOLLOW_COUNTS, import_obj
 
 
 class ExpandRelatedField(serializers.RelatedField):
@@ -14,6 +15,37 @@ class ExpandRelatedField(serializers.RelatedField):
         return registered_serializers[value.__class__](value).data
 
 
+class FollowCountsField(serializers.Field):
+    """
+    Read only field with the number of followers/following of an object,
+    see FollowManager.counts_for
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', '*')
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        counts = self.context.get('follow_counts', {})
+        if obj not in counts:
+            counts.update(Follow.objects.counts_for([obj]))
+        return counts[obj]
+
+
+class FollowCountsListSerializer(serializers.ListSerializer):
+    """
+    Fetches the follow counts of every instance at once
+    """
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, BaseManager) else data)
+        fields = [field for field in self.child.fields.values() if isinstance(field, FollowCountsField)]
+        objects = [field.get_attribute(instance) for field in fields for instance in instances]
+        self.context.setdefault('follow_counts', {}).update(
+            Follow.objects.counts_for([obj for obj in objects if obj is not None])
+        )
+        return super().to_representation(instances)
+
+
 DEFAULT_SERIALIZER = serializers.ModelSerializer
 
 
@@ -25,8 +57,15 @@ def serializer_factory(model_class):
     if model_label in DRF_SETTINGS['SERIALIZERS']:
         return import_obj(DRF_SETTINGS['SERIALIZERS'][model_label])
     model_fields = DRF_SETTINGS['MODEL_FIELDS'].get(model_label, '__all__')
-    meta_class = type('Meta', (), {'model': model_class, 'fields': model_fields})
-    return type(f'{model_class.__name__}Serializer', (DEFAULT_SERIALIZER,), {'Meta': meta_class})
+    attrs = {}
+    meta_attrs = {'model': model_class, 'fields': model_fields}
+    if USE_FOLLOW_COUNTS:
+        attrs['follow_counts'] = FollowCountsField()
+        meta_attrs['list_serializer_class'] = FollowCountsListSerializer
+        if model_fields != '__all__':
+            meta_attrs['fields'] = list(model_fields) + ['follow_counts']
+    attrs['Meta'] = type('Meta', (), meta_attrs)
+    return type(f'{model_class.__name__}Serializer', (DEFAULT_SERIALIZER,), attrs)
 
 
 def related_field_factory(model_class, queryset=None):
@@ -76,6 +115,17 @@ class ActionSerializer(DEFAULT_SERIALIZER):
         fields = 'id verb public description timestamp actor target action_object'.split()
 
 
+class AggregatedActionSerializer(ActionSerializer):
+    """
+    Serializer for the collapsed actions of aggregated streams
+    """
+    aggregated_count = serializers.IntegerField(read_only=True)
+    first_timestamp = serializers.DateTimeField(read_only=True)
+
+    class Meta(ActionSerializer.Meta):
+        fields = ActionSerializer.Meta.fields + ['aggregated_count', 'first_timestamp']
+
+
 class SendActionSerializer(serializers.Serializer):
     """
     Serializer used when POSTing a new action to DRF
@@ -95,10 +145,15 @@ class FollowSerializer(DEFAULT_SERIALIZER):
     """
     user = get_grf()
     follow_object = get_grf()
+    if USE_FOLLOW_COUNTS:
+        follow_object_counts = FollowCountsField(source='follow_object')
 
     class Meta:
         model = Follow
-        fields = 'id flag user follow_object started actor_only'.split()
+        fields = 'id flag user follow_object started actor_only'.split() + (
+            ['follow_object_counts'] if USE_FOLLOW_COUNTS else [])
+        if USE_FOLLOW_COUNTS:
+            list_serializer_class = FollowCountsListSerializer
 
 
 class FollowingSerializer(DEFAULT_SERIALIZER):
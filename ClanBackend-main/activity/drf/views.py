@@ -9,8 +9,11 @@ from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import APIException, NotFound
+from rest_framework.settings import api_settings
 
 from activity.drf import serializers
+from activity.drf.pagination import ActionCursorPagination
+from activity.gfk import GFKResolver
 from activity import models
 from activity.registry import label
 from activity.settings import DRF_SETTINGS, import_obj
@@ -25,6 +28,9 @@ def get_or_not_found(klass, detail=None, **kwargs):
         raise NotFound(detail, 404)
 
 
+AGGREGATION_PERIODS = ('minute', 'hour', 'day', 'week', 'month')
+
+
 class ModelNotRegistered(APIException):
     status_code = 400
     default_detail = 'Model requested was not registered. Use actstream.registry.register to add it'
@@ -54,6 +60,8 @@ class DefaultModelViewSet(viewsets.ReadOnlyModelViewSet):
 class ActionViewSet(DefaultModelViewSet):
     queryset = models.Action.objects.public().order_by('-timestamp', '-id').prefetch_related()
     serializer_class = serializers.ActionSerializer
+    pagination_class = ActionCursorPagination if DRF_SETTINGS['CURSOR_PAGINATION'] \
+        else api_settings.DEFAULT_PAGINATION_CLASS
 
     @action(detail=False, permission_classes=[permissions.IsAuthenticated], methods=['POST'], serializer_class=serializers.SendActionSerializer)
     def send(self, request):
@@ -84,6 +92,7 @@ class ActionViewSet(DefaultModelViewSet):
         """
         Helper for paginating streams and serializing responses
         """
+        stream = stream.fetch_generic_relations(resolver=GFKResolver.for_request(self.request))
         page = self.paginate_queryset(stream)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -91,6 +100,15 @@ class ActionViewSet(DefaultModelViewSet):
         serializer = self.get_serializer(stream, many=True)
         return Response(serializer.data)
 
+    def get_stream_kwargs(self, request):
+        """
+        Returns the query parameters as stream filters, leaving out the pagination ones
+        """
+        kwargs = request.query_params.dict()
+        for param in ('page_query_param', 'page_size_query_param', 'cursor_query_param'):
+            kwargs.pop(getattr(self.paginator, param, None), None)
+        return kwargs
+
     def get_detail_stream(self, stream, content_type_id, object_id):
         """
         Helper for returning a stream that takes a content type/object id to lookup an instance
@@ -113,9 +131,22 @@ class ActionViewSet(DefaultModelViewSet):
         Returns all actions for users that the current user follows
         See models.user_stream
         """
-        kwargs = request.query_params.dict()
+        kwargs = self.get_stream_kwargs(request)
         return self.get_stream(models.user_stream(request.user, **kwargs))
 
+    @action(detail=False, url_path='streams/following/aggregated', permission_classes=[permissions.IsAuthenticated],
+            serializer_class=serializers.AggregatedActionSerializer, name='Aggregated actions by followed users')
+    def following_aggregated(self, request):
+        """
+        Returns the actions for users that the current user follows, collapsing the ones
+        with the same actor, verb and target within a ``period`` (minute/hour/day/week/month)
+        See models.user_aggregated_stream
+        """
+        kwargs = self.get_stream_kwargs(request)
+        if kwargs.get('period', 'hour') not in AGGREGATION_PERIODS:
+            return Response({'period': f'Must be one of {", ".join(AGGREGATION_PERIODS)}'}, status=400)
+        return self.get_stream(models.user_aggregated_stream(request.user, **kwargs))
+
     @action(detail=False, url_path='streams/model/(?P<content_type_id>[^/.]+)', name='Model activity stream')
     def model_stream(self, request, content_type_id):
         """
@@ -189,6 +220,31 @@ class FollowViewSet(DefaultModelViewSet):
         data = {'is_following': following}
         return Response(json.dumps(data))
 
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            url_path='is_following_many', name='Whether user is following each object')
+    def is_following_many(self, request):
+        """
+        Returns whether the current user is following each of the objects passed as
+        comma separated content_type_id:object_id pairs in the ``objects`` parameter,
+        eg ``?objects=7:1,7:2,9:15``
+        """
+        try:
+            pairs = [pair.split(':', 1) for pair in request.query_params.get('objects', '').split(',') if pair]
+            keys = [(int(content_type_id), object_id) for content_type_id, object_id in pairs]
+        except ValueError:
+            return Response(status=400)
+        resolver = GFKResolver.for_request(request)
+        resolver.fetch(set(keys) - set(resolver.objects))
+        instances = [resolver.objects.get(key) for key in keys]
+        following = iter(models.Follow.objects.is_following_many(
+            request.user, [instance for instance in instances if instance is not None],
+            flag=request.query_params.get('flag', '')
+        ))
+        return Response({
+            f'{content_type_id}:{object_id}': instance is not None and next(following)
+            for (content_type_id, object_id), instance in zip(keys, instances)
+        })
+
     @action(detail=False, permission_classes=[permissions.IsAuthenticated],
             url_path='following', name='List of instances I follow')
     def following(self, request):
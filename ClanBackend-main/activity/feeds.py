@@ -1,17 +1,88 @@
 import json
+from copy import copy
+from hashlib import md5
+from urllib.parse import quote
 
 from django.shortcuts import get_object_or_404
+from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.feedgenerator import Atom1Feed, rfc3339_date
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.syndication.views import Feed, add_domain
 from django.contrib.sites.models import Site
 from django.utils.encoding import force_str
+from django.utils.functional import cached_property
 from django.views.generic import View
-from django.http import HttpResponse, Http404
+from django.db import connections
+from django.db.models import Count, Max
+from django.http import HttpResponse, Http404, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import RFC3986_SUBDELIMS, http_date
 
-from activity.models import Action, model_stream, user_stream, any_stream
+from activity import settings
+from activity.gfk import GFKResolver
+from activity.models import Action, Follow, model_stream, user_stream, any_stream
+from clan.pagination import encode, keyset
+
+
+def estimate_count(queryset):
+    """
+    Returns the query planner's estimate of the number of rows of the queryset
+    on PostgreSQL, None on other databases.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.explain(format='json'))
+    if isinstance(plan, list):
+        plan = plan[0]
+    return plan['Plan']['Plan Rows']
+
+
+class FeedContext:
+    """
+    Lookups shared by all the items of a feed render, made at most once:
+    the domain of the current site, the content types of the objects and the
+    URL prefixes of the action and actor pages.
+    """
+
+    def __init__(self):
+        self.content_types = {}
+
+    @cached_property
+    def domain(self):
+        return Site.objects.get_current().domain
+
+    @cached_property
+    def detail_url(self):
+        return reverse('actstream_detail', None, ('__pk__',)).replace('__pk__', '{0}')
+
+    @cached_property
+    def actor_url(self):
+        return reverse('actstream_actor', None, ('__ct__', '__pk__')).replace(
+            '__ct__', '{0}').replace('__pk__', '{1}')
+
+    def content_type(self, obj):
+        """
+        Returns the id and the name of the content type of the object.
+        """
+        try:
+            return self.content_types[obj.__class__]
+        except KeyError:
+            ctype = ContentType.objects.get_for_model(obj)
+            return self.content_types.setdefault(obj.__class__, (ctype.pk, ctype.name))
+
+    def get_url(self, action, obj=None):
+        """
+        Returns the path of the action, or of the actor page of the object, like ``reverse`` would.
+        """
+        if not obj:
+            return self.detail_url.format(self.quote(action.pk))
+        return self.actor_url.format(self.content_type(obj)[0], self.quote(obj.pk))
+
+    @staticmethod
+    def quote(value):
+        return quote(str(value), safe=RFC3986_SUBDELIMS + '~:@')
 
 
 class AbstractActivityStream:
@@ -19,6 +90,9 @@ class AbstractActivityStream:
     Abstract base class for all stream rendering.
     Supports hooks for fetching streams and formatting actions.
     """
+    cursor_query_param = 'cursor'
+    page_size = 30
+    feed_context = None
 
     def get_stream(self, *args, **kwargs):
         """
@@ -38,6 +112,89 @@ class AbstractActivityStream:
         """
         return self.get_stream()(self.get_object(*args, **kwargs))
 
+    def paginate(self, request, stream, limit=None):
+        """
+        Returns a list of at most ``limit`` actions following the cursor of the request,
+        in ``(timestamp, id)`` order, and the URL of the next page or None.
+        """
+        if limit is None:
+            limit = self.page_size
+        stream = self.resolve(request, stream)
+        try:
+            stream = keyset(stream, request.GET.get(self.cursor_query_param))
+        except ValueError:
+            raise Http404('Invalid cursor')
+        page = list(stream[:limit + 1])
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        params = request.GET.copy()
+        params[self.cursor_query_param] = encode(page[-1])
+        return page, request.build_absolute_uri('?' + params.urlencode())
+
+    def resolve(self, request, stream):
+        """
+        Resolves the actors, targets and action objects of the stream with the
+        resolver of the request, one query per content type for the whole page.
+        """
+        return stream.fetch_generic_relations(resolver=GFKResolver.for_request(request))
+
+    def get_feed_context(self):
+        """
+        Returns the FeedContext of the render in progress, or a new one outside of renders.
+        """
+        return self.feed_context or FeedContext()
+
+    def get_follow_validators(self, request):
+        """
+        Returns a version and the last change date of the follows the stream
+        is made of, or ``(None, None)`` if it does not depend on follows.
+        """
+        return None, None
+
+    def get_validators(self, request, stream):
+        """
+        Returns the ETag and Last-Modified date of the stream for the request,
+        derived from its newest action with a single indexed query and from
+        ``get_follow_validators()``, or ``(None, None)`` if the stream is already sliced.
+        """
+        if stream.query.is_sliced:
+            return None, None
+        timestamp, pk = stream.order_by('-timestamp', '-pk').values_list('timestamp', 'pk').first() or (None, None)
+        version, started = self.get_follow_validators(request)
+        user = getattr(request, 'user', None)
+        key = '{}:{}:{}:{}:{}'.format(request.get_full_path(), getattr(user, 'pk', None),
+                                      timestamp and timestamp.isoformat(), pk, version)
+        last_modified = max(filter(None, (timestamp, started)), default=None)
+        return '"%s"' % md5(key.encode(), usedforsecurity=False).hexdigest(), last_modified
+
+    def conditional_response(self, request, stream, render):
+        """
+        Returns a 304 response if the client already has the newest version of
+        the stream, else the response of ``render()``. Rendered responses are
+        kept in the ACTIVITY_SETTINGS['FEED_CACHE'] cache, keyed by their ETag.
+        """
+        etag, last_modified = self.get_validators(request, stream)
+        if etag is None:
+            return render()
+        last_modified = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cache = caches[settings.FEED_CACHE] if settings.FEED_CACHE else None
+            key = 'activity:feed:%s' % etag.strip('"')
+            cached = cache.get(key) if cache is not None else None
+            if cached is None:
+                response = render()
+                if cache is not None and not response.streaming and response.status_code == 200:
+                    cache.set(key, (response.content, response['Content-Type']), settings.FEED_CACHE_TIMEOUT)
+            else:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
     def get_uri(self, action, obj=None, date=None):
         """
         Returns an RFC3987 IRI ID for the given object, action and date.
@@ -45,7 +202,7 @@ class AbstractActivityStream:
         if date is None:
             date = action.timestamp
         date = date.strftime('%Y-%m-%d')
-        return 'tag:{},{}:{}'.format(Site.objects.get_current().domain, date,
+        return 'tag:{},{}:{}'.format(self.get_feed_context().domain, date,
                                      self.get_url(action, obj, False))
 
     def get_url(self, action, obj=None, domain=True):
@@ -53,15 +210,13 @@ class AbstractActivityStream:
         Returns an RFC3987 IRI for a HTML representation of the given object, action.
         If domain is true, the current site's domain will be added.
         """
-        if not obj:
-            url = reverse('actstream_detail', None, (action.pk,))
-        elif hasattr(obj, 'get_absolute_url'):
+        context = self.get_feed_context()
+        if obj and hasattr(obj, 'get_absolute_url'):
             url = obj.get_absolute_url()
         else:
-            ctype = ContentType.objects.get_for_model(obj)
-            url = reverse('actstream_actor', None, (ctype.pk, obj.pk))
+            url = context.get_url(action, obj)
         if domain:
-            return add_domain(Site.objects.get_current().domain, url)
+            return add_domain(context.domain, url)
         return url
 
     def format(self, action):
@@ -92,7 +247,7 @@ class AbstractActivityStream:
         return {
             'id': self.get_uri(action, obj),
             'url': self.get_url(action, obj),
-            'objectType': ContentType.objects.get_for_model(obj).name,
+            'objectType': self.get_feed_context().content_type(obj)[1],
             'displayName': str(obj)
         }
 
@@ -127,6 +282,8 @@ class ActivityStreamsAtomFeed(Atom1Feed):
 
     def add_root_elements(self, handler):
         super(ActivityStreamsAtomFeed, self).add_root_elements(handler)
+        if self.feed.get('next_link'):
+            handler.addQuickElement('link', '', {'rel': 'next', 'href': self.feed['next_link']})
 
     def quick_elem(self, handler, key, value):
         if key == 'link':
@@ -165,6 +322,31 @@ class ActivityStreamsAtomFeed(Atom1Feed):
 
 
 class ActivityStreamsBaseFeed(AbstractActivityStream, Feed):
+    request = None
+    next_link = None
+
+    def __call__(self, request, *args, **kwargs):
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404('Feed object does not exist.')
+        return self.conditional_response(request, self.get_stream()(obj), lambda: self.render(request, obj))
+
+    def render(self, request, obj):
+        # Feed.__call__ without fetching the object again
+        feedgen = self.get_feed(obj, request)
+        response = HttpResponse(content_type=feedgen.content_type)
+        feedgen.write(response, 'utf-8')
+        return response
+
+    def get_feed(self, obj, request):
+        # Feed instances are shared between requests, keep the page state on a copy
+        feed = copy(self)
+        feed.request = request
+        feed.feed_context = FeedContext()
+        feedgen = Feed.get_feed(feed, obj, request)
+        feedgen.feed['next_link'] = feed.next_link
+        return feedgen
 
     def feed_extra_kwargs(self, obj):
         """
@@ -202,24 +384,87 @@ class ActivityStreamsBaseFeed(AbstractActivityStream, Feed):
             return force_str(action.description)
 
     def items(self, obj):
-        return self.get_stream()(obj)[:30]
+        if self.request is None:
+            return self.get_stream()(obj)[:self.page_size]
+        page, self.next_link = self.paginate(self.request, self.get_stream()(obj))
+        return page
 
 
 class JSONActivityFeed(AbstractActivityStream, View):
     """
     Feed that generates feeds compatible with the v1.0 JSON Activity Stream spec
+    Passing ``cursor`` or ``limit`` in the query string returns a single page
+    and the URL of the next one.
+
+    With ``streaming`` enabled (eg ``as_view(streaming=True)``) unpaginated
+    feeds are written out ``chunk_size`` actions at a time. ``totalItems`` then
+    comes last, unless ``approximate_count`` is set and the database can
+    estimate it upfront.
+
+    Responses carry an ETag and a Last-Modified date from the newest action
+    of the stream, and from the follows of user feeds, so polling clients get
+    a 304 while the stream is unchanged.
     """
+    limit_query_param = 'limit'
+    max_limit = 100
+    streaming = False
+    chunk_size = 500
+    approximate_count = False
 
     def dispatch(self, request, *args, **kwargs):
-        return HttpResponse(self.serialize(request, *args, **kwargs),
-                            content_type='application/json')
-
-    def serialize(self, request, *args, **kwargs):
         items = self.items(request, *args, **kwargs)
+        return self.conditional_response(request, items, lambda: self.render(request, items))
+
+    def render(self, request, items):
+        self.feed_context = FeedContext()
+        if self.streaming and not self.is_paginated(request):
+            return StreamingHttpResponse(self.stream(request, items),
+                                         content_type='application/json')
+        return HttpResponse(self.serialize(request, items), content_type='application/json')
+
+    def is_paginated(self, request):
+        return self.cursor_query_param in request.GET or self.limit_query_param in request.GET
+
+    def get_indent(self, request):
+        return 4 if 'pretty' in request.GET or 'pretty' in request.POST else None
+
+    def serialize(self, request, items):
+        items = self.resolve(request, items)
+        data = {}
+        if self.is_paginated(request):
+            items, data['next'] = self.paginate(request, items, self.get_limit(request))
         return json.dumps({
             'totalItems': len(items),
-            'items': [self.format(action) for action in items]
-        }, indent=4 if 'pretty' in request.GET or 'pretty' in request.POST else None)
+            'items': [self.format(action) for action in items],
+            **data
+        }, indent=self.get_indent(request))
+
+    def stream(self, request, items):
+        """
+        Yields the JSON document of the feed, iterating over the stream in
+        chunks instead of loading it at once.
+        """
+        indent = self.get_indent(request)
+        total = estimate_count(items) if self.approximate_count else None
+        if total is None:
+            yield '{"items": ['
+        else:
+            yield '{"totalItems": %d, "items": [' % total
+        count = 0
+        for chunk in items.chunks(self.chunk_size):
+            for action in chunk:
+                yield (',' if count else '') + json.dumps(self.format(action), indent=indent)
+                count += 1
+        if total is None:
+            yield '], "totalItems": %d}' % count
+        else:
+            yield ']}'
+
+    def get_limit(self, request):
+        try:
+            return min(max(int(request.GET[self.limit_query_param]), 1), self.max_limit)
+        except (KeyError, ValueError):
+            return self.page_size
 
 
 class ModelActivityMixin:
@@ -263,6 +508,14 @@ class UserActivityMixin:
     def get_stream(self):
         return user_stream
 
+    def get_follow_validators(self, request):
+        # a new follow can bring older actions in, an unfollow take any out
+        if not request.user.is_authenticated:
+            return None, None
+        follows = Follow.objects.filter(user=request.user).aggregate(
+            count=Count('pk'), last=Max('pk'), started=Max('started'))
+        return '{count}:{last}'.format(**follows), follows['started']
+
     def get_stream_kwargs(self, request):
         stream_kwargs = {}
         if 'with_user_activity' in request.GET:
@@ -0,0 +1,93 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import transaction
+
+from activity import settings
+
+
+def get_cache():
+    """
+    Returns the cache backend configured in ACTIVITY_SETTINGS['FOLLOW_CACHE'], if any.
+    """
+    if settings.FOLLOW_CACHE:
+        return caches[settings.FOLLOW_CACHE]
+
+
+def following_key(user_id):
+    return 'activity:following:{}'.format(user_id)
+
+
+def followers_key(content_type_id, object_id, flag=''):
+    return 'activity:followers:{}:{}:{}'.format(content_type_id, object_id, flag)
+
+
+def following(user):
+    """
+    Returns the ``(content type id, object id, flag)`` followed by the user,
+    in the order of the follows.
+    """
+    cache = get_cache()
+    key = following_key(user.pk)
+    follows = cache.get(key)
+    if follows is None:
+        follows = tuple(
+            (content_type_id, str(object_id), flag)
+            for content_type_id, object_id, flag in apps.get_model('activity', 'follow').objects.filter(
+                user=user).order_by('pk').values_list('content_type_id', 'object_id', 'flag')
+        )
+        cache.set(key, follows, settings.FOLLOW_CACHE_TIMEOUT)
+    return follows
+
+
+def follower_ids(obj, flag=''):
+    """
+    Returns the set of ids of the users following the object with the flag, with any flag if empty.
+    """
+    cache = get_cache()
+    content_type_id = ContentType.objects.get_for_model(obj).pk
+    key = followers_key(content_type_id, obj.pk, flag)
+    user_ids = cache.get(key)
+    if user_ids is None:
+        queryset = apps.get_model('activity', 'follow').objects.for_object(obj, flag=flag)
+        user_ids = frozenset(queryset.values_list('user_id', flat=True))
+        cache.set(key, user_ids, settings.FOLLOW_CACHE_TIMEOUT)
+    return user_ids
+
+
+def is_following_many(user, objects, flag=''):
+    """
+    Returns whether the user follows each of the objects, in the same order.
+    """
+    follows = set(following(user))
+    if flag:
+        return [
+            (ContentType.objects.get_for_model(obj).pk, str(obj.pk), flag) in follows
+            for obj in objects
+        ]
+    followed = {(content_type_id, object_id) for content_type_id, object_id, _ in follows}
+    return [(ContentType.objects.get_for_model(obj).pk, str(obj.pk)) in followed for obj in objects]
+
+
+def invalidate(user_ids=(), content_type_id=None, object_id=None, flags=()):
+    """
+    Drops the cached follows of the users and the cached followers of the object,
+    again once the current transaction commits: until then concurrent readers
+    still see, and may cache, the previous follows.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    keys = [following_key(user_id) for user_id in user_ids]
+    if content_type_id is not None:
+        keys += [followers_key(content_type_id, object_id, flag) for flag in {'', *flags}]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_follow(user, obj, flag=''):
+    """
+    Drops the cached entries affected by the user (un)following the object.
+    """
+    if get_cache() is not None:
+        invalidate([user.pk], ContentType.objects.get_for_model(obj).pk, obj.pk, [flag])
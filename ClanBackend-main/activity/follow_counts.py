@@ -0,0 +1,94 @@
+from collections import Counter
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+
+def adjust(changes, field):
+    """
+    Adds the deltas of ``changes``, a mapping of ``(content type id, object id, flag)``
+    to an integer, to the ``field`` counter (``followers`` or ``following``).
+    """
+    FollowCount = apps.get_model('activity', 'followcount')
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    FollowCount.objects.bulk_create([
+        FollowCount(content_type_id=content_type_id, object_id=object_id, flag=flag)
+        for content_type_id, object_id, flag in changes
+    ], ignore_conflicts=True)
+    for (content_type_id, object_id, flag), delta in changes.items():
+        FollowCount.objects.filter(
+            content_type_id=content_type_id, object_id=object_id, flag=flag
+        ).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def followed(user, obj, flag='', delta=1):
+    """
+    Counts a follow of ``obj`` by ``user`` (or its removal with a negative ``delta``).
+    """
+    adjust({(ContentType.objects.get_for_model(obj).pk, str(obj.pk), flag): delta}, 'followers')
+    adjust({(ContentType.objects.get_for_model(user).pk, str(user.pk), flag): delta}, 'following')
+
+
+def removed(follows):
+    """
+    Uncounts the follows of a queryset about to be deleted.
+    """
+    user_content_type = ContentType.objects.get_for_model(get_user_model()).pk
+    followers, following = Counter(), Counter()
+    for content_type_id, object_id, user_id, flag in follows.values_list(
+            'content_type_id', 'object_id', 'user_id', 'flag'):
+        followers[(content_type_id, object_id, flag)] -= 1
+        following[(user_content_type, str(user_id), flag)] -= 1
+    adjust(followers, 'followers')
+    adjust(following, 'following')
+
+
+def reconcile():
+    """
+    Fixes the counters that differ from the follows and returns their number.
+
+    Each counter is only written if it did not change since it was read, so the
+    follows counted meanwhile by ``adjust`` are never overwritten with stale
+    counts; a counter skipped that way is fixed by the next run.
+    """
+    FollowCount = apps.get_model('activity', 'followcount')
+    Follow = apps.get_model('activity', 'follow')
+    user_content_type = ContentType.objects.get_for_model(get_user_model()).pk
+    # read before the follows, see above
+    current = {
+        (content_type_id, object_id, flag): (pk, followers, following)
+        for pk, content_type_id, object_id, flag, followers, following in FollowCount.objects.values_list(
+            'pk', 'content_type_id', 'object_id', 'flag', 'followers', 'following')
+    }
+    counts = {}
+    for content_type_id, object_id, flag, count in Follow.objects.order_by().values_list(
+            'content_type_id', 'object_id', 'flag').annotate(count=Count('pk')):
+        counts[(content_type_id, object_id, flag)] = [count, 0]
+    for user_id, flag, count in Follow.objects.order_by().values_list(
+            'user_id', 'flag').annotate(count=Count('pk')):
+        counts.setdefault((user_content_type, str(user_id), flag), [0, 0])[1] = count
+
+    # bulk_create returns the rows skipped on conflict too, count the rows instead
+    before = FollowCount.objects.count()
+    FollowCount.objects.bulk_create([
+        FollowCount(content_type_id=content_type_id, object_id=object_id, flag=flag,
+                    followers=followers, following=following)
+        for (content_type_id, object_id, flag), (followers, following) in counts.items()
+        if (content_type_id, object_id, flag) not in current
+    ], batch_size=10000, ignore_conflicts=True)
+    fixed = FollowCount.objects.count() - before
+    for key, (pk, followers, following) in current.items():
+        expected = counts.get(key)
+        if [followers, following] == (expected or [0, 0]):
+            continue
+        unchanged = FollowCount.objects.filter(pk=pk, followers=followers, following=following)
+        if expected is None:
+            fixed += unchanged.delete()[0]
+        else:
+            fixed += unchanged.update(followers=expected[0], following=expected[1])
+    return fixed
@@ -1,6 +1,9 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ImproperlyConfigured
 
-from activity.models import Follow
+from activity import follow_cache, follow_counts, settings
+from activity.models import Follow, FollowCount
 
 
 def delete_orphaned_follows(sender, instance=None, **kwargs):
@@ -10,7 +13,27 @@ def delete_orphaned_follows(sender, instance=None, **kwargs):
     if str(sender._meta) == 'migrations.migration':
         return
 
+    if isinstance(instance, get_user_model()):
+        if settings.FOLLOW_CACHE:
+            follow_cache.invalidate([instance.pk])
+        if settings.USE_FOLLOW_COUNTS:
+            # their follows are deleted along with them
+            follow_counts.removed(Follow.objects.filter(user=instance))
+
     try:
-        Follow.objects.for_object(instance).delete()
+        follows = Follow.objects.for_object(instance)
+        if settings.FOLLOW_CACHE:
+            users_and_flags = list(follows.values_list('user_id', 'flag'))
+            follow_cache.invalidate(
+                [user_id for user_id, _ in users_and_flags],
+                ContentType.objects.get_for_model(instance).pk, instance.pk,
+                [flag for _, flag in users_and_flags]
+            )
+        if settings.USE_FOLLOW_COUNTS:
+            follow_counts.removed(follows)
+            FollowCount.objects.filter(
+                content_type=ContentType.objects.get_for_model(instance), object_id=instance.pk
+            ).delete()
+        follows.delete()
     except ImproperlyConfigured:  # raised by actstream for irrelevant models
         pass
@@ -1,10 +1,172 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import router
 from django.db.models import Manager
-from django.db.models.query import QuerySet, EmptyQuerySet
+from django.db.models.base import DEFERRED
+from django.db.models.query import ModelIterable, QuerySet, EmptyQuerySet
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 from activity import settings
 
 
+def cache_key(content_type_id, object_id):
+    return 'activity:gfk:{}:{}'.format(content_type_id, object_id)
+
+
+def get_cache():
+    """
+    Returns the cache backend configured in ACTIVITY_SETTINGS['GFK_CACHE'], if any.
+    """
+    if settings.GFK_CACHE:
+        return caches[settings.GFK_CACHE]
+
+
+def cached_fields(model):
+    """
+    Returns the attnames of the fields of a model kept in the generic relation
+    cache, those of ACTIVITY_SETTINGS['GFK_CACHE_FIELDS'] or else of the DRF
+    MODEL_FIELDS, or None if the model is not cached. Only registered models
+    are cached, the registry invalidates them on save and delete.
+    """
+    from activity.registry import label, registry
+    if model not in registry:
+        return None
+    model_label = label(model)
+    names = settings.GFK_CACHE_FIELDS.get(
+        model_label, settings.DRF_SETTINGS['MODEL_FIELDS'].get(model_label)
+    )
+    if not names or names == '__all__':
+        return None
+    opts = model._meta
+    attnames = [opts.pk.attname]
+    for name in names:
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field in opts.concrete_fields and field.attname not in attnames:
+            attnames.append(field.attname)
+    return attnames
+
+
+def from_cache(model, values):
+    """
+    Returns an instance of the model from its cached field values,
+    the fields not cached are deferred.
+    """
+    return model.from_db(
+        router.db_for_read(model), list(values),
+        [values.get(field.attname, DEFERRED) for field in model._meta.concrete_fields]
+    )
+
+
+def invalidate_cached_object(sender, instance=None, **kwargs):
+    """
+    Drops a saved or deleted object from the generic relation cache.
+    Connected by the registry for each registered model.
+    """
+    cache = get_cache()
+    if cache is None or instance is None or instance.pk is None:
+        return
+    cache.delete(cache_key(ContentType.objects.get_for_model(sender).pk, instance.pk))
+
+
+class GFKResolver:
+    """
+    Resolves the generic foreign keys of a batch of instances with a single
+    query per content type, whichever relation (actor, target, ...) points at it.
+
+    Resolved objects are memoized for the lifetime of the resolver, create one per
+    request to share them between every stream rendered by that request. The
+    fields listed by ``cached_fields`` are also kept in the cache configured by
+    ACTIVITY_SETTINGS['GFK_CACHE'], never whole instances. ``QuerySet.update()``
+    sends no signal, so its changes show once GFK_CACHE_TIMEOUT has passed.
+    ``queries`` and ``cache_hits`` count how the objects were obtained.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = get_cache() if cache is None else cache
+        self.objects = {}
+        self.queries = 0
+        self.cache_hits = 0
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        Returns the resolver shared by everything rendered for the request.
+        """
+        if not hasattr(request, '_activity_gfk_resolver'):
+            request._activity_gfk_resolver = cls()
+        return request._activity_gfk_resolver
+
+    def get_fields(self, model, names=()):
+        fields = [f for f in model._meta.private_fields if isinstance(f, GenericForeignKey)]
+        if names:
+            fields = [f for f in fields if f.name in names]
+        return fields
+
+    def resolve(self, instances, *names):
+        """
+        Populates the generic foreign keys (all of them unless names are given)
+        of the instances. Returns the instances.
+        """
+        instances = [instance for instance in instances if instance is not None]
+        if not instances:
+            return instances
+        fields = self.get_fields(instances[0].__class__, names)
+
+        pointers = []
+        for instance in instances:
+            for field in fields:
+                content_type_id = getattr(instance, field.ct_field + '_id')
+                object_id = getattr(instance, field.fk_field)
+                if content_type_id is not None and object_id is not None:
+                    pointers.append((instance, field, (content_type_id, str(object_id))))
+
+        self.fetch({key for _, _, key in pointers} - set(self.objects))
+
+        for instance, field, key in pointers:
+            if key in self.objects:
+                field.set_cached_value(instance, self.objects[key])
+        return instances
+
+    def fetch(self, keys):
+        if not keys:
+            return
+        if self.cache is not None:
+            cached = self.cache.get_many([cache_key(*key) for key in keys])
+            for key in list(keys):
+                if cache_key(*key) in cached:
+                    model = ContentType.objects.get_for_id(key[0]).model_class()
+                    self.objects[key] = from_cache(model, cached[cache_key(*key)])
+                    self.cache_hits += 1
+                    keys.discard(key)
+
+        by_content_type = defaultdict(set)
+        for content_type_id, object_id in keys:
+            by_content_type[content_type_id].add(object_id)
+
+        fetched = {}
+        for content_type_id, object_ids in by_content_type.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is None:
+                continue
+            pk = model._meta.pk
+            attnames = cached_fields(model) if self.cache is not None else None
+            self.queries += 1
+            for obj in model._base_manager.filter(pk__in=[pk.to_python(i) for i in object_ids]):
+                key = (content_type_id, str(obj.pk))
+                self.objects[key] = obj
+                if attnames:
+                    fetched[cache_key(*key)] = {name: getattr(obj, name) for name in attnames}
+
+        if fetched:
+            self.cache.set_many(fetched, settings.GFK_CACHE_TIMEOUT)
+
+
 class GFKManager(Manager):
     """
     A manager that returns a GFKQuerySet instead of a regular QuerySet.
@@ -22,26 +184,56 @@ class GFKQuerySet(QuerySet):
     """
     A QuerySet with a fetch_generic_relations() method to bulk fetch
     all generic related items.  Similar to select_related(), but for
-    generic foreign keys. This wraps QuerySet.prefetch_related.
+    generic foreign keys. The relations are resolved by a GFKResolver
+    once the queryset is evaluated.
     """
 
-    def fetch_generic_relations(self, *args):
+    def __init__(self, *args, **kwargs):
+        super(GFKQuerySet, self).__init__(*args, **kwargs)
+        self._gfk_fields = None
+        self._gfk_resolver = None
+
+    def fetch_generic_relations(self, *args, resolver=None):
         qs = self._clone()
 
         if not settings.FETCH_RELATIONS:
             return qs
 
-        private_fields = self.model._meta.private_fields
-
-        gfk_fields = [g for g in private_fields if isinstance(g, GenericForeignKey)]
-
-        if args:
-            gfk_fields = [g for g in gfk_fields if g.name in args]
-
-        return qs.prefetch_related(*[g.name for g in gfk_fields])
+        qs._gfk_fields = args
+        qs._gfk_resolver = resolver or self._gfk_resolver
+        return qs
+
+    def chunks(self, chunk_size=2000):
+        """
+        Iterates the queryset with ``.iterator()`` and yields lists of at most
+        ``chunk_size`` instances, resolving the generic relations of each list
+        with its own resolver so memory does not grow with the queryset.
+        """
+        chunk = []
+        for instance in self.iterator(chunk_size=chunk_size):
+            chunk.append(instance)
+            if len(chunk) == chunk_size:
+                yield self._resolve_generic_relations(chunk, GFKResolver())
+                chunk = []
+        if chunk:
+            yield self._resolve_generic_relations(chunk, GFKResolver())
+
+    def _resolve_generic_relations(self, instances, resolver=None):
+        if self._gfk_fields is not None and self._iterable_class is ModelIterable:
+            (resolver or self._gfk_resolver or GFKResolver()).resolve(instances, *self._gfk_fields)
+        return instances
+
+    def _fetch_all(self):
+        resolve = self._result_cache is None
+        super(GFKQuerySet, self)._fetch_all()
+        if resolve:
+            self._resolve_generic_relations(self._result_cache)
 
     def _clone(self, klass=None, **kwargs):
-        return super(GFKQuerySet, self)._clone()
+        clone = super(GFKQuerySet, self)._clone()
+        clone._gfk_fields = self._gfk_fields
+        clone._gfk_resolver = self._gfk_resolver
+        return clone
 
     def none(self):
         clone = self._clone({'klass': EmptyGFKQuerySet})
@@ -51,5 +243,5 @@ class GFKQuerySet(QuerySet):
 
 
 class EmptyGFKQuerySet(GFKQuerySet, EmptyQuerySet):
-    def fetch_generic_relations(self, *args):
+    def fetch_generic_relations(self, *args, **kwargs):
         return self
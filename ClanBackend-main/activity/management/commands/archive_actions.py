@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from activity import partitions, settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates the coming monthly partitions of the action table and archives the partitions '
+        'older than ACTIVITY_SETTINGS["RETENTION_MONTHS"] as gzipped CSV files on the archive storage.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-months', type=int, default=settings.RETENTION_MONTHS,
+                            help='Number of months of actions to keep.')
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            raise CommandError('The action table is not partitioned, run partition_actions first.')
+        for path in partitions.maintain_partitions(retention_months=options['retention_months']):
+            self.stdout.write(f'Archived {path}')
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from activity import settings, timelines
+from activity.models import Action, Follow
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized activity timelines from the follow graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', type=int, dest='users', default=[],
+            help='Only backfill the timeline of the given user id. May be repeated.'
+        )
+        parser.add_argument(
+            '--size', type=int, default=settings.TIMELINE_BACKFILL_SIZE,
+            help='Number of most recent actions to copy into each timeline.'
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(
+            pk__in=Follow.objects.values('user_id')
+        ).order_by('pk')
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+
+        total = 0
+        for user in users.iterator():
+            stream = Action.objects.user(user, use_timeline=False)
+            total += len(timelines.backfill(user, stream, size=options['size']))
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} timeline entries.'))
@@ -0,0 +1,55 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import BigIntegerField, Max, UUIDField
+from django.db.models.functions import Cast
+
+from activity.models import Action, Follow
+from activity.registry import registry
+from activity.typed_ids import TYPED_ID_FIELDS, id_type
+
+
+OUTPUT_FIELDS = {
+    'int': BigIntegerField(),
+    'uuid': UUIDField(),
+}
+
+GENERIC_FIELDS = (
+    (Action, 'actor_content_type', 'actor_object'),
+    (Action, 'target_content_type', 'target_object'),
+    (Action, 'action_object_content_type', 'action_object_object'),
+    (Follow, 'content_type', 'object'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the char object ids of actions and follows into the typed id columns '
+        'used when ACTIVITY_SETTINGS["USE_TYPED_IDS"] is enabled.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Number of rows updated per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model_class in registry:
+            kind = id_type(model_class)
+            if not kind:
+                continue
+            content_type = ContentType.objects.get_for_model(model_class)
+            for model, content_type_field, prefix in GENERIC_FIELDS:
+                typed_field = TYPED_ID_FIELDS[kind] % prefix
+                queryset = model.objects.filter(**{
+                    content_type_field: content_type,
+                    '%s__isnull' % typed_field: True,
+                })
+                last_pk = queryset.aggregate(last=Max('pk'))['last'] or 0
+                updated = 0
+                for start in range(0, last_pk + 1, batch_size):
+                    with transaction.atomic():
+                        updated += queryset.filter(pk__gte=start, pk__lt=start + batch_size).update(**{
+                            typed_field: Cast('%s_id' % prefix, output_field=OUTPUT_FIELDS[kind])
+                        })
+                self.stdout.write(f'{model.__name__}.{typed_field} ({content_type}): {updated} rows')
@@ -0,0 +1,116 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from activity.benchmarks import analyze, create_actors, get_scenarios, measure, seed_actions, seed_follows
+from activity.models import Action, Follow
+from activity.registry import check
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the latency percentiles and SQL queries of the activity streams, follow '
+        'lookups, feeds and DRF stream actions, optionally on generated data '
+        '(eg --actions 1000000 --follows 100000). '
+        'Generated data is rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--actions', type=int, default=0,
+                            help='Number of actions to generate before measuring.')
+        parser.add_argument('--follows', type=int, default=0,
+                            help='Number of follows to generate before measuring.')
+        parser.add_argument('--actors', type=int, default=1000,
+                            help='Number of users to generate the actions and follows between.')
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='Zipf exponent of the distribution of followers and actions per user.')
+        parser.add_argument('--repeat', type=int, default=10,
+                            help='Number of times each scenario is run.')
+        parser.add_argument('--page-size', type=int, default=30,
+                            help='Number of items read by each scenario.')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only run the scenarios starting with this prefix, eg "streams" or "feeds.json".')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--explain', action='store_true',
+                            help='Print the query plan of each stream.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            check(User)
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+
+        with transaction.atomic():
+            if options['actions'] or options['follows']:
+                actors = create_actors(options['actors'])
+                seed_actions(actors, options['actions'], skew=options['skew'])
+                seed_follows(actors, options['follows'], skew=options['skew'])
+                analyze(Action, Follow)
+            actor = self.get_actor(User)
+
+            report = {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'actions': Action.objects.count(),
+                'follows': Follow.objects.count(),
+                'repeat': options['repeat'],
+                'page_size': options['page_size'],
+                'results': {},
+            }
+            scenarios = get_scenarios(actor, page_size=options['page_size'])
+            for name, scenario in scenarios.items():
+                if options['only'] and not name.startswith(tuple(options['only'])):
+                    continue
+                try:
+                    # a savepoint per scenario, so that a failing query does not abort the others
+                    with transaction.atomic():
+                        result = measure(scenario, repeat=options['repeat'])
+                except Exception as error:
+                    report['results'][name] = {'error': repr(error)}
+                    self.stderr.write(f'{name}: {error!r}')
+                    continue
+                report['results'][name] = result
+                self.stderr.write(
+                    '{name}: p50={p50:.2f}ms p95={p95:.2f}ms p99={p99:.2f}ms queries={queries:g}'.format(
+                        name=name, **result)
+                )
+                if options['explain'] and name.startswith('streams.'):
+                    self.stderr.write(self.explain(name, actor, options['page_size']))
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_actor(self, User):
+        """
+        Returns the user following the most objects, so the user stream has work to do.
+        """
+        busiest = Follow.objects.values('user').annotate(following=Count('pk')).order_by('-following').first()
+        queryset = User._default_manager.order_by('pk')
+        actor = queryset.filter(pk=busiest['user']).first() if busiest else queryset.first()
+        if actor is None:
+            raise CommandError('There are no users to read the streams of.')
+        return actor
+
+    def explain(self, name, actor, page_size):
+        stream = getattr(Action.objects, name.split('.', 1)[1])
+        obj = get_user_model() if name == 'streams.model_actions' else actor
+        return stream(obj)[:page_size].explain()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from activity import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Converts the action table into a PostgreSQL table partitioned by month on timestamp. '
+        'Takes an exclusive lock on the table while its rows are copied.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning is only supported on PostgreSQL.')
+        if partitions.is_partitioned():
+            raise CommandError('The action table is already partitioned.')
+        partitions.partition_table()
+        for name, month in partitions.get_partitions():
+            self.stdout.write(f'{name}: {month:%Y-%m}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from activity import follow_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the follower and following counters from the follows.'
+
+    def handle(self, *args, **options):
+        count = follow_counts.reconcile()
+        self.stdout.write(f'{count} counters fixed')
@@ -2,12 +2,16 @@ from typing import Type
 
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q, Model
+from django.db.models import Count, F, Min, Model, OuterRef, Q, Subquery, Window
+from django.db.models.functions import FirstValue, Trunc
 from django.contrib.auth import get_user_model
 
-from activity.gfk import GFKManager
+from activity import follow_cache, settings
+from activity.gfk import GFKManager, GFKResolver
 from activity.decorators import stream
 from activity.registry import check
+from activity.timelines import heavy_follows
+from activity.typed_ids import field_name, object_lookup
 
 
 class ActionManager(GFKManager):
@@ -22,6 +26,13 @@ class ActionManager(GFKManager):
         kwargs['public'] = True
         return self.filter(*args, **kwargs)
 
+    def bulk_send(self, actions, batch_size=None):
+        """
+        Creates many actions with bulk inserts, see ``activity.actions.send_many``.
+        """
+        from activity.actions import send_many
+        return send_many(actions, batch_size=batch_size)
+
     @stream
     def actor(self, obj: Model, **kwargs):
         """
@@ -49,6 +60,18 @@ class ActionManager(GFKManager):
         check(obj)
         return obj.action_object_actions.public(**kwargs)
 
+    def _union(self, *filters):
+        """
+        Returns a filter matching the public actions of any of the given lookups.
+        Each lookup runs as its own subquery so it can use the composite
+        (content type, object id, timestamp) index of its column pair, the
+        subqueries are combined with UNION ALL instead of an OR across columns.
+        The branches filter on ``public`` themselves, the indexes being partial,
+        so the filter needs no ``public()`` around it.
+        """
+        branches = [self.public(**lookup).order_by().values('pk') for lookup in filters]
+        return Q(pk__in=branches[0].union(*branches[1:], all=True))
+
     @stream
     def model_actions(self, model: Type[Model], **kwargs):
         """
@@ -70,21 +93,25 @@ class ActionManager(GFKManager):
         """
         check(obj)
         ctype = ContentType.objects.get_for_model(obj)
-        return self.public(
-            Q(
-                actor_content_type=ctype,
-                actor_object_id=obj.pk,
-            ) | Q(
-                target_content_type=ctype,
-                target_object_id=obj.pk,
-            ) | Q(
-                action_object_content_type=ctype,
-                action_object_object_id=obj.pk,
-            ), **kwargs)
+        return self.filter(
+            self._union(
+                {'actor_content_type': ctype, **object_lookup('actor_object', obj)},
+                {'target_content_type': ctype, **object_lookup('target_object', obj)},
+                {'action_object_content_type': ctype, **object_lookup('action_object_object', obj)},
+            ),
+            **kwargs
+        )
 
     @stream
-    def user(self, obj: Model, with_user_activity=False, follow_flag=None, **kwargs):
-        """Create a stream of the most recent actions by objects that the user is following."""
+    def user(self, obj: Model, with_user_activity=False, follow_flag=None, use_timeline=None, **kwargs):
+        """
+        Create a stream of the most recent actions by objects that the user is following.
+
+        With ``ACTIVITY_SETTINGS['USE_TIMELINES']`` enabled the stream is read from the
+        user's materialized timeline, only objects exceeding the fan-out limit are
+        resolved from the follows at query time. Filtering by ``follow_flag`` always
+        reads from the follows.
+        """
         q = Q()
         qs = self.public()
 
@@ -93,40 +120,96 @@ class ActionManager(GFKManager):
 
         check(obj)
 
+        if use_timeline is None:
+            use_timeline = settings.USE_TIMELINES
+        use_timeline = use_timeline and not follow_flag
+
         if with_user_activity:
             q = q | Q(
                 actor_content_type=ContentType.objects.get_for_model(obj),
-                actor_object_id=obj.pk
+                **object_lookup('actor_object', obj)
             )
 
         follows = apps.get_model('activity', 'follow').objects.filter(user=obj)
         if follow_flag:
             follows = follows.filter(flag=follow_flag)
 
+        if use_timeline:
+            q = q | Q(pk__in=apps.get_model('activity', 'timeline').objects.filter(
+                user=obj).values('action_id'))
+            follows = heavy_follows(follows)
+
         content_types = ContentType.objects.filter(
             pk__in=follows.values('content_type_id')
         )
 
-        if not (content_types.exists() or with_user_activity):
+        if not (content_types.exists() or with_user_activity or use_timeline):
             return qs.none()
 
         for content_type in content_types:
+            model_class = content_type.model_class()
             object_ids = follows.filter(content_type=content_type)
+            follow_field = field_name('object', model_class)
             q = q | Q(
                 actor_content_type=content_type,
-                actor_object_id__in=object_ids.values('object_id')
+                **{'%s__in' % field_name('actor_object', model_class): object_ids.values(follow_field)}
             ) | Q(
                 target_content_type=content_type,
-                target_object_id__in=object_ids.filter(
-                    actor_only=False).values('object_id')
+                **{'%s__in' % field_name('target_object', model_class): object_ids.filter(
+                    actor_only=False).values(follow_field)}
             ) | Q(
                 action_object_content_type=content_type,
-                action_object_object_id__in=object_ids.filter(
-                    actor_only=False).values('object_id')
+                **{'%s__in' % field_name('action_object_object', model_class): object_ids.filter(
+                    actor_only=False).values(follow_field)}
             )
 
         return qs.filter(q, **kwargs)
 
+    def collapsed(self, queryset, period=None):
+        """
+        Collapses the actions of the queryset sharing actor, verb and target within
+        the same ``period`` (``'hour'``, ``'day'``, ... defaults to
+        ``ACTIVITY_SETTINGS['AGGREGATION_PERIOD']``) into the most recent one.
+        Each action is annotated with ``aggregated_count``, the number of actions
+        it stands for, and ``first_timestamp``, the timestamp of the oldest one.
+
+        The window functions run in subqueries over the whole queryset and the
+        collapsed actions are selected by pk, so the filters added later on, eg
+        the ``_cursor``/``_since``/``_until`` of streams, apply outside of the
+        window: the counts stay the same and no group is split across pages.
+        """
+        partition = [
+            F('actor_content_type'), F('actor_object_id'), F('verb'),
+            F('target_content_type'), F('target_object_id'),
+            Trunc('timestamp', period or settings.AGGREGATION_PERIOD),
+        ]
+        windows = queryset.annotate(
+            aggregated_count=Window(Count('pk'), partition_by=partition),
+            first_timestamp=Window(Min('timestamp'), partition_by=partition),
+            aggregated_pk=Window(FirstValue('pk'), partition_by=partition,
+                                 order_by=[F('timestamp').desc(), F('pk').desc()]),
+        ).order_by()
+        group = windows.filter(aggregated_pk=OuterRef('pk'))
+        return self.filter(pk__in=windows.values('aggregated_pk')).annotate(
+            aggregated_count=Subquery(group.values('aggregated_count')[:1]),
+            first_timestamp=Subquery(group.values('first_timestamp')[:1]),
+        )
+
+    @stream
+    def user_aggregated(self, obj: Model, period=None, **kwargs):
+        """
+        Stream of the actions by objects that the user is following, collapsed with ``collapsed``.
+        """
+        return self.collapsed(self.user(obj, **kwargs), period)
+
+    @stream
+    def any_aggregated(self, obj: Model, period=None, **kwargs):
+        """
+        Stream of the actions where obj is the actor OR target OR action_object,
+        collapsed with ``collapsed``.
+        """
+        return self.collapsed(self.any(obj, **kwargs), period)
+
 
 class FollowManager(GFKManager):
     """
@@ -139,7 +222,7 @@ class FollowManager(GFKManager):
         """
         check(instance)
         content_type = ContentType.objects.get_for_model(instance).pk
-        queryset = self.filter(content_type=content_type, object_id=instance.pk)
+        queryset = self.filter(content_type=content_type, **object_lookup('object', instance))
         if flag:
             queryset = queryset.filter(flag=flag)
         return queryset
@@ -150,12 +233,86 @@ class FollowManager(GFKManager):
         """
         if not user or user.is_anonymous:
             return False
+        if settings.FOLLOW_CACHE:
+            check(instance)
+            return follow_cache.is_following_many(user, [instance], flag=flag)[0]
         queryset = self.for_object(instance)
 
         if flag:
             queryset = queryset.filter(flag=flag)
         return queryset.filter(user=user).exists()
 
+    def is_following_many(self, user, instances, flag=''):
+        """
+        Check if a user is following each of the instances, with a single lookup.
+        Returns a list of booleans in the order of the instances.
+        """
+        instances = list(instances)
+        if not user or user.is_anonymous:
+            return [False] * len(instances)
+        for instance in instances:
+            check(instance)
+        if settings.FOLLOW_CACHE:
+            return follow_cache.is_following_many(user, instances, flag=flag)
+
+        by_content_type = {}
+        for instance in instances:
+            by_content_type.setdefault(ContentType.objects.get_for_model(instance), []).append(instance)
+        q = Q()
+        for content_type, objects in by_content_type.items():
+            q |= Q(content_type=content_type, object_id__in=[str(obj.pk) for obj in objects])
+        queryset = self.filter(q, user=user)
+        if flag:
+            queryset = queryset.filter(flag=flag)
+        followed = set(queryset.values_list('content_type_id', 'object_id'))
+        return [
+            (ContentType.objects.get_for_model(instance).pk, str(instance.pk)) in followed
+            for instance in instances
+        ]
+
+    def counts_for(self, objects, flag=None):
+        """
+        Returns a dictionary of each object to its number of ``followers`` and, for
+        users, the number of objects they are ``following``, in one or two queries.
+        Follows with any flag are counted unless a ``flag`` is given, ``''`` only
+        counting plain follows.
+
+        The counters maintained with ``ACTIVITY_SETTINGS['USE_FOLLOW_COUNTS']`` are
+        read when enabled, the follows are counted otherwise.
+        """
+        objects = list(objects)
+        keys = {obj: (ContentType.objects.get_for_model(obj).pk, str(obj.pk)) for obj in objects}
+        counts = {key: {'followers': 0, 'following': 0} for key in keys.values()}
+        if not objects:
+            return {}
+        by_content_type = {}
+        for content_type_id, object_id in keys.values():
+            by_content_type.setdefault(content_type_id, []).append(object_id)
+        q = Q()
+        for content_type_id, object_ids in by_content_type.items():
+            q |= Q(content_type_id=content_type_id, object_id__in=object_ids)
+        flag_filter = {} if flag is None else {'flag': flag}
+
+        if settings.USE_FOLLOW_COUNTS:
+            rows = apps.get_model('activity', 'followcount').objects.filter(q, **flag_filter).values_list(
+                'content_type_id', 'object_id', 'followers', 'following')
+            for content_type_id, object_id, followers, following in rows:
+                counts[(content_type_id, object_id)]['followers'] += followers
+                counts[(content_type_id, object_id)]['following'] += following
+        else:
+            rows = self.filter(q, **flag_filter).order_by().values_list(
+                'content_type_id', 'object_id').annotate(count=Count('pk'))
+            for content_type_id, object_id, count in rows:
+                counts[(content_type_id, object_id)]['followers'] = count
+            user_content_type = ContentType.objects.get_for_model(get_user_model()).pk
+            user_ids = by_content_type.get(user_content_type)
+            if user_ids:
+                rows = self.filter(user_id__in=user_ids, **flag_filter).order_by().values_list(
+                    'user_id').annotate(count=Count('pk'))
+                for user_id, count in rows:
+                    counts[(user_content_type, str(user_id))]['following'] = count
+        return {obj: counts[key] for obj, key in keys.items()}
+
     def followers_qs(self, actor, flag=''):
         """
         Returns a queryset of User objects who are following the given actor (eg my followers).
@@ -163,7 +320,7 @@ class FollowManager(GFKManager):
         check(actor)
         queryset = self.filter(
             content_type=ContentType.objects.get_for_model(actor),
-            object_id=actor.pk
+            **object_lookup('object', actor)
         ).select_related('user')
 
         if flag:
@@ -174,7 +331,11 @@ class FollowManager(GFKManager):
         """
         Returns a list of User objects who are following the given actor (eg my followers).
         """
-        user_ids = self.followers_qs(actor, flag=flag).values_list('user', flat=True)
+        if settings.FOLLOW_CACHE:
+            check(actor)
+            user_ids = list(follow_cache.follower_ids(actor, flag=flag))
+        else:
+            user_ids = self.followers_qs(actor, flag=flag).values_list('user', flat=True)
         return get_user_model().objects.filter(id__in=user_ids)
 
     def following_qs(self, user, *models, **kwargs):
@@ -194,7 +355,7 @@ class FollowManager(GFKManager):
 
         if flag:
             qs = qs.filter(flag=flag)
-        return qs.fetch_generic_relations('follow_object')
+        return qs.order_by('pk').fetch_generic_relations('follow_object')
 
     def following(self, user, *models, **kwargs):
         """
@@ -202,6 +363,22 @@ class FollowManager(GFKManager):
         Items in the list can be of any model unless a list of restricted models are passed.
         Eg following(user, User) will only return users following the given user
         """
-        return [follow.follow_object for follow in self.following_qs(
-            user, *models, flag=kwargs.get('flag', '')
-        )]
+        flag = kwargs.get('flag', '')
+        if settings.FOLLOW_CACHE:
+            content_type_ids = set()
+            for model in models:
+                check(model)
+                content_type_ids.add(ContentType.objects.get_for_model(model).pk)
+            follows = [
+                self.model(content_type_id=content_type_id, object_id=object_id)
+                for content_type_id, object_id in dict.fromkeys(
+                    (content_type_id, object_id)
+                    for content_type_id, object_id, follow_flag in follow_cache.following(user)
+                    if (not flag or follow_flag == flag)
+                    and (not content_type_ids or content_type_id in content_type_ids)
+                )
+            ]
+            GFKResolver().resolve(follows, 'follow_object')
+        else:
+            follows = self.following_qs(user, *models, flag=flag)
+        return [follow.follow_object for follow in follows]
@@ -25,6 +25,8 @@ class Follow(models.Model):
         ContentType, on_delete=models.CASCADE, db_index=True
     )
     object_id = models.CharField(max_length=255, db_index=True)
+    object_int_id = models.BigIntegerField(blank=True, null=True, editable=False)
+    object_uuid = models.UUIDField(blank=True, null=True, editable=False, db_index=True)
     follow_object = GenericForeignKey()
     actor_only = models.BooleanField(
         "Only follow actions where "
@@ -37,6 +39,10 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('user', 'content_type', 'object_id', 'flag')
+        indexes = [
+            models.Index(fields=['content_type', 'object_int_id']),
+            models.Index(fields=['user', 'content_type', 'object_int_id', 'flag']),
+        ]
 
     def __str__(self):
         return '{} -> {} : {}'.format(self.user, self.follow_object, self.flag)
@@ -76,6 +82,8 @@ class Action(models.Model):
         on_delete=models.CASCADE, db_index=True
     )
     actor_object_id = models.CharField(max_length=255, db_index=True)
+    actor_object_int_id = models.BigIntegerField(blank=True, null=True, editable=False)
+    actor_object_uuid = models.UUIDField(blank=True, null=True, editable=False, db_index=True)
     actor = GenericForeignKey('actor_content_type', 'actor_object_id')
 
     verb = models.CharField(max_length=255, db_index=True)
@@ -89,6 +97,8 @@ class Action(models.Model):
     target_object_id = models.CharField(
         max_length=255, blank=True, null=True, db_index=True
     )
+    target_object_int_id = models.BigIntegerField(blank=True, null=True, editable=False)
+    target_object_uuid = models.UUIDField(blank=True, null=True, editable=False, db_index=True)
     target = GenericForeignKey(
         'target_content_type',
         'target_object_id'
@@ -102,6 +112,8 @@ class Action(models.Model):
     action_object_object_id = models.CharField(
         max_length=255, blank=True, null=True, db_index=True
     )
+    action_object_object_int_id = models.BigIntegerField(blank=True, null=True, editable=False)
+    action_object_object_uuid = models.UUIDField(blank=True, null=True, editable=False, db_index=True)
     action_object = GenericForeignKey(
         'action_object_content_type',
         'action_object_object_id'
@@ -115,6 +127,39 @@ class Action(models.Model):
 
     class Meta:
         ordering = ('-timestamp',)
+        # streams filter public actions on a (content type, object id) pair
+        # and read them newest first
+        indexes = [
+            models.Index(
+                fields=['actor_content_type', 'actor_object_id', '-timestamp'],
+                condition=models.Q(public=True), name='activity_actor_public_idx'
+            ),
+            models.Index(
+                fields=['target_content_type', 'target_object_id', '-timestamp'],
+                condition=models.Q(public=True), name='activity_target_public_idx'
+            ),
+            models.Index(
+                fields=['action_object_content_type', 'action_object_object_id', '-timestamp'],
+                condition=models.Q(public=True), name='activity_object_public_idx'
+            ),
+            # typed id columns, see ACTIVITY_SETTINGS['USE_TYPED_IDS']
+            models.Index(
+                fields=['actor_content_type', 'actor_object_int_id', '-timestamp'],
+                condition=models.Q(public=True), name='activity_actor_int_public_idx'
+            ),
+            models.Index(
+                fields=['target_content_type', 'target_object_int_id', '-timestamp'],
+                condition=models.Q(public=True), name='activity_target_int_public_idx'
+            ),
+            models.Index(
+                fields=['action_object_content_type', 'action_object_object_int_id', '-timestamp'],
+                condition=models.Q(public=True), name='activity_object_int_public_idx'
+            ),
+            models.Index(
+                fields=['-timestamp', '-id'],
+                condition=models.Q(public=True), name='activity_public_timestamp_idx'
+            ),
+        ]
 
     def __str__(self):
         ctx = {
@@ -165,6 +210,50 @@ class Action(models.Model):
             'actstream_detail', args=[self.pk])
 
 
+class Timeline(models.Model):
+    """
+    Materialized entry of an action in a user's stream.
+    Written on fan-out when ACTIVITY_SETTINGS['USE_TIMELINES'] is enabled.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name='activity_timeline'
+    )
+    action = models.ForeignKey(
+        Action, on_delete=models.CASCADE, related_name='timeline_entries'
+    )
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-timestamp',)
+        unique_together = ('user', 'action')
+        indexes = [
+            models.Index(fields=['user', '-timestamp']),
+        ]
+
+    def __str__(self):
+        return '{} <- {}'.format(self.user, self.action_id)
+
+
+class FollowCount(models.Model):
+    """
+    Denormalized number of follows of an object (``followers``) and, for users,
+    of follows by the object (``following``), for each flag.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=255)
+    flag = models.CharField(max_length=255, blank=True, default='')
+    followers = models.PositiveIntegerField(default=0)
+    following = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'flag')
+
+    def __str__(self):
+        return '{}:{} {} : {}/{}'.format(
+            self.content_type_id, self.object_id, self.flag, self.followers, self.following)
+
+
 # convenient accessors
 actor_stream = Action.objects.actor
 action_object_stream = Action.objects.action_object
@@ -172,5 +261,7 @@ target_stream = Action.objects.target
 user_stream = Action.objects.user
 model_stream = Action.objects.model_actions
 any_stream = Action.objects.any
+user_aggregated_stream = Action.objects.user_aggregated
+any_aggregated_stream = Action.objects.any_aggregated
 followers = Follow.objects.followers
 following = Follow.objects.following
@@ -0,0 +1,197 @@
+"""
+Monthly range partitioning of the Action table on PostgreSQL.
+
+The ``partition_actions`` command converts the table once, after which
+``maintain_partitions`` creates the partitions of the coming months and
+detaches the partitions older than ``ACTIVITY_SETTINGS['RETENTION_MONTHS']``
+into gzipped CSV files on the archive storage.
+"""
+import gzip
+from datetime import datetime
+from tempfile import TemporaryFile
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from activity import settings
+
+
+def month_start(date):
+    return datetime(date.year, date.month, 1, tzinfo=date.tzinfo)
+
+
+def add_months(date, months):
+    month = date.month - 1 + months
+    return date.replace(year=date.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def partition_name(month):
+    return '{}_p{:%Y_%m}'.format(get_table(), month)
+
+
+def get_table():
+    return apps.get_model('activity', 'action')._meta.db_table
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned():
+    """
+    Returns True if the Action table is a partitioned PostgreSQL table.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)", [get_table()]
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partitions():
+    """
+    Returns the names and the first month of the monthly partitions of the Action table, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid) ORDER BY c.relname",
+            [get_table()]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = '%s_p' % get_table()
+    partitions = []
+    for name in names:
+        try:
+            month = datetime.strptime(name[len(prefix):], '%Y_%m')
+        except ValueError:  # the default partition
+            continue
+        partitions.append((name, month.replace(tzinfo=now().tzinfo)))
+    return partitions
+
+
+def create_partition(month):
+    """
+    Creates the partition holding the actions of the month if it does not exist.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)'.format(
+                quote(partition_name(month)), quote(get_table())),
+            [month, add_months(month, 1)]
+        )
+
+
+def create_partitions(start, months_ahead=None):
+    """
+    Creates the monthly partitions from ``start`` up to ``months_ahead`` months from now.
+    """
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    month, last = month_start(start), add_months(month_start(now()), months_ahead)
+    while month <= last:
+        create_partition(month)
+        month = add_months(month, 1)
+
+
+def partition_table():
+    """
+    Converts the Action table into a table partitioned by month on ``timestamp``.
+
+    The existing table is renamed to ``<table>_unpartitioned`` and its rows are
+    copied over. The primary key becomes ``(id, timestamp)``, as PostgreSQL
+    requires, so foreign keys to actions (eg from timelines) are dropped.
+    """
+    table = get_table()
+    old = '%s_unpartitioned' % table
+    Action = apps.get_model('activity', 'action')
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE {} RENAME TO {}'.format(quote(table), quote(old)))
+        cursor.execute(
+            'CREATE TABLE {} (LIKE {} INCLUDING ALL EXCLUDING INDEXES EXCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE ({})'.format(quote(table), quote(old), quote('timestamp'))
+        )
+        cursor.execute('ALTER TABLE {} ADD PRIMARY KEY ({}, {})'.format(
+            quote(table), quote('id'), quote('timestamp')))
+        for field in Action._meta.concrete_fields:
+            if field.remote_field and field.db_constraint:
+                cursor.execute(
+                    'ALTER TABLE {} ADD FOREIGN KEY ({}) REFERENCES {} ({}) DEFERRABLE INITIALLY DEFERRED'.format(
+                        quote(table), quote(field.column),
+                        quote(field.related_model._meta.db_table), quote(field.target_field.column))
+                )
+        cursor.execute('CREATE TABLE {} PARTITION OF {} DEFAULT'.format(
+            quote('%s_default' % table), quote(table)))
+
+        cursor.execute('SELECT MIN({}) FROM {}'.format(quote('timestamp'), quote(old)))
+        oldest = cursor.fetchone()[0] or now()
+        create_partitions(oldest)
+        cursor.execute('INSERT INTO {} SELECT * FROM {}'.format(quote(table), quote(old)))
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id'), pg_get_serial_sequence(%s, 'id')", [old, table])
+        old_sequence, sequence = cursor.fetchone()
+        if sequence is None:
+            # a serial id keeps the sequence of the old table, which must outlive it
+            sequence = old_sequence
+            cursor.execute('ALTER SEQUENCE {} OWNED BY {}.{}'.format(sequence, quote(table), quote('id')))
+        cursor.execute('SELECT setval(%s, COALESCE(MAX(id), 1)) FROM {}'.format(quote(table)), [sequence])
+        cursor.execute('DROP TABLE {} CASCADE'.format(quote(old)))
+
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for sql in schema_editor._model_indexes_sql(Action):
+                schema_editor.execute(sql)
+
+
+def export_partition(name, fileobj):
+    """
+    Writes the rows of a partition to ``fileobj`` as gzipped CSV with a header.
+    """
+    with gzip.GzipFile(fileobj=fileobj, mode='wb') as gz, connection.cursor() as cursor:
+        sql = 'COPY {} TO STDOUT WITH (FORMAT csv, HEADER)'.format(quote(name))
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            raw.copy_expert(sql, gz)
+        else:
+            with raw.copy(sql) as copy:
+                for data in copy:
+                    gz.write(data)
+
+
+def archive_partition(name, month, storage=None):
+    """
+    Detaches a partition, saves its rows to the archive storage and drops it.
+    Returns the name of the archive file.
+    """
+    storage = storage or storages[settings.ARCHIVE_STORAGE]
+    with TemporaryFile() as tmp:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE {} DETACH PARTITION {}'.format(quote(get_table()), quote(name)))
+            export_partition(name, tmp)
+            tmp.seek(0)
+            path = storage.save('{}{}.csv.gz'.format(settings.ARCHIVE_PATH, name), File(tmp))
+            cursor.execute('DROP TABLE {}'.format(quote(name)))
+        apps.get_model('activity', 'timeline').objects.filter(timestamp__lt=add_months(month, 1)).delete()
+    return path
+
+
+def maintain_partitions(retention_months=None, storage=None):
+    """
+    Creates the partitions of the coming months and archives the partitions
+    older than the retention period. Returns the names of the archive files.
+    """
+    if retention_months is None:
+        retention_months = settings.RETENTION_MONTHS
+    create_partitions(now())
+    if not retention_months:
+        return []
+    cutoff = add_months(month_start(now()), -retention_months)
+    return [
+        archive_partition(name, month, storage=storage)
+        for name, month in get_partitions() if month < cutoff
+    ]
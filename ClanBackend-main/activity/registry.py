@@ -3,8 +3,12 @@ from inspect import isclass
 from django.apps import apps
 from django.contrib.contenttypes.fields import GenericRelation
 from django.db.models.base import ModelBase
+from django.db.models.signals import post_delete, post_save
 from django.core.exceptions import ImproperlyConfigured
 
+from activity.gfk import invalidate_cached_object
+from activity.typed_ids import field_name
+
 
 class RegistrationError(Exception):
     pass
@@ -32,7 +36,7 @@ def setup_generic_relations(model_class):
         attr_value = '{}_as_{}'.format(related_attr_value, field)
         kwargs = {
             'content_type_field': '%s_content_type' % field,
-            'object_id_field': '%s_object_id' % field,
+            'object_id_field': field_name('%s_object' % field, model_class),
             related_attr_name: attr_value
         }
         rel = GenericRelation('activity.Action', **kwargs)
@@ -88,12 +92,20 @@ class ActionableModelRegistry(dict):
             model_class = validate(class_or_label)
             if model_class not in self:
                 self[model_class] = setup_generic_relations(model_class)
+                post_save.connect(invalidate_cached_object, sender=model_class,
+                                  dispatch_uid='activity.gfk.save.%s' % label(model_class))
+                post_delete.connect(invalidate_cached_object, sender=model_class,
+                                    dispatch_uid='activity.gfk.delete.%s' % label(model_class))
 
     def unregister(self, *model_classes_or_labels):
         for class_or_label in model_classes_or_labels:
             model_class = validate(class_or_label)
             if model_class in self:
                 del self[model_class]
+                post_save.disconnect(sender=model_class,
+                                     dispatch_uid='activity.gfk.save.%s' % label(model_class))
+                post_delete.disconnect(sender=model_class,
+                                       dispatch_uid='activity.gfk.delete.%s' % label(model_class))
 
     def check(self, model_class_or_object):
         if getattr(model_class_or_object, '_deferred', None):
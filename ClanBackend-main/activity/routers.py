@@ -0,0 +1,123 @@
+"""
+Routing of the reads of the activity models to read replicas.
+
+Add ``activity.routers.ReplicaRouter`` to ``DATABASE_ROUTERS`` and the
+replica aliases to ``ACTIVITY_SETTINGS['REPLICAS']``. The reads of streams,
+follows and feeds then go to a random replica, except:
+
+- inside a transaction of the primary, which may hold uncommitted rows,
+- for ``REPLICA_PIN_SECONDS`` after a user's own ``follow``/``unfollow`` or
+  ``action.send`` (read-your-writes): the user is pinned to the primary in
+  the ``REPLICA_PIN_CACHE`` cache, which ``ReplicaPinningMiddleware`` looks
+  up on the following requests, and the current context is pinned as well.
+
+For tests, a replica alias with ``'TEST': {'MIRROR': 'default'}`` stands in
+for a real replica by reading from the test database of the primary.
+"""
+import random
+from contextvars import ContextVar
+from time import monotonic
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from activity import settings
+
+
+_pinned_until = ContextVar('activity_pinned_until', default=0)
+_request = ContextVar('activity_request', default=None)
+
+
+def pinned_key(user_id):
+    return 'activity:pinned:{}'.format(user_id)
+
+
+def pin(user=None):
+    """
+    Sends the reads of the current context, and of the user's next requests,
+    to the primary for ``REPLICA_PIN_SECONDS``.
+    """
+    if not settings.REPLICAS:
+        return
+    _pinned_until.set(monotonic() + settings.REPLICA_PIN_SECONDS)
+    if isinstance(user, get_user_model()) and user.pk is not None:
+        caches[settings.REPLICA_PIN_CACHE].set(pinned_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def pin_actor(actor):
+    """
+    Pins the user behind an action: the actor if it is a user, else the
+    authenticated user of the current request. Actions of other actors sent
+    outside of a request, eg by tasks, pin nothing.
+    """
+    if not settings.REPLICAS:
+        return
+    if not isinstance(actor, get_user_model()):
+        actor = getattr(_request.get(), 'user', None)
+        if actor is None or not actor.is_authenticated:
+            return
+    pin(actor)
+
+
+def is_pinned():
+    """
+    Returns True if the reads of the current context must go to the primary.
+    """
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block or _pinned_until.get() > monotonic():
+        return True
+    request = _request.get()
+    if request is None:
+        return False
+    pinned = getattr(request, '_activity_pinned', None)
+    if pinned is None:
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            # the user may still be authenticated later on, eg by DRF
+            return False
+        pinned = request._activity_pinned = bool(
+            caches[settings.REPLICA_PIN_CACHE].get(pinned_key(user.pk)))
+    return pinned
+
+
+class ReplicaRouter:
+    """
+    Routes the reads of the activity models to ACTIVITY_SETTINGS['REPLICAS'].
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'activity' or not settings.REPLICAS or is_pinned():
+            return None
+        return random.choice(settings.REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Makes the requests of users who just wrote to the activity models read
+    from the primary, see ``activity.routers``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_token, pinned_token = _request.set(request), _pinned_until.set(0)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(request_token)
+            _pinned_until.reset(pinned_token)
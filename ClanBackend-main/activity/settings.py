@@ -29,12 +29,59 @@ FETCH_RELATIONS = SETTINGS.get('FETCH_RELATIONS', True)
 
 USE_JSONFIELD = SETTINGS.get('USE_JSONFIELD', False)
 
+ASYNC = SETTINGS.get('ASYNC', False)
+
+AGGREGATION_PERIOD = SETTINGS.get('AGGREGATION_PERIOD', 'hour')
+
+BULK_BATCH_SIZE = SETTINGS.get('BULK_BATCH_SIZE', 1000)
+
+GFK_CACHE = SETTINGS.get('GFK_CACHE', None)
+
+GFK_CACHE_TIMEOUT = SETTINGS.get('GFK_CACHE_TIMEOUT', 300)
+
+GFK_CACHE_FIELDS = {
+    label.lower(): fields for label, fields in SETTINGS.get('GFK_CACHE_FIELDS', {}).items()
+}
+
+FEED_CACHE = SETTINGS.get('FEED_CACHE', None)
+
+FEED_CACHE_TIMEOUT = SETTINGS.get('FEED_CACHE_TIMEOUT', 30)
+
+FOLLOW_CACHE = SETTINGS.get('FOLLOW_CACHE', None)
+
+FOLLOW_CACHE_TIMEOUT = SETTINGS.get('FOLLOW_CACHE_TIMEOUT', 3600)
+
+REPLICAS = SETTINGS.get('REPLICAS', [])
+
+REPLICA_PIN_SECONDS = SETTINGS.get('REPLICA_PIN_SECONDS', 5)
+
+REPLICA_PIN_CACHE = SETTINGS.get('REPLICA_PIN_CACHE', 'default')
+
+USE_FOLLOW_COUNTS = SETTINGS.get('USE_FOLLOW_COUNTS', False)
+
+USE_TYPED_IDS = SETTINGS.get('USE_TYPED_IDS', False)
+
+USE_TIMELINES = SETTINGS.get('USE_TIMELINES', False)
+
+TIMELINE_FANOUT_LIMIT = SETTINGS.get('TIMELINE_FANOUT_LIMIT', 5000)
+
+TIMELINE_BACKFILL_SIZE = SETTINGS.get('TIMELINE_BACKFILL_SIZE', 100)
+
+PARTITION_MONTHS_AHEAD = SETTINGS.get('PARTITION_MONTHS_AHEAD', 2)
+
+RETENTION_MONTHS = SETTINGS.get('RETENTION_MONTHS', None)
+
+ARCHIVE_STORAGE = SETTINGS.get('ARCHIVE_STORAGE', 'default')
+
+ARCHIVE_PATH = SETTINGS.get('ARCHIVE_PATH', 'activity/archive/')
+
 USE_DRF = 'DRF' in SETTINGS
 
 DRF_SETTINGS = {
     'ENABLE': False,
     'EXPAND_FIELDS': True,
     'HYPERLINK_FIELDS': False,
+    'CURSOR_PAGINATION': False,
     'SERIALIZERS': {},
     'MODEL_FIELDS': {},
     'VIEWSETS': {},
@@ -1,3 +1,14 @@
 from django.dispatch import Signal
 
-action = Signal()
+
+class ActionSignal(Signal):
+
+    def send_many(self, actions, batch_size=None):
+        """
+        Creates many actions at once, see ``activity.actions.send_many``.
+        """
+        from activity.actions import send_many
+        return send_many(actions, batch_size=batch_size)
+
+
+action = ActionSignal()
@@ -1,5 +1,7 @@
 from functools import wraps
 
+from clan.pagination import keyset
+
 
 def stream(func):
     """
@@ -15,15 +17,28 @@ def stream(func):
             def foobar(self, ...):
                 ...
 
+    Every stream accepts ``_offset``/``_limit`` to slice the result,
+    ``_cursor`` (an encoded cursor or an Action) to only return the actions
+    following that position in ``(timestamp, id)`` order, and ``_since``/``_until``
+    datetimes bounding the timestamps, which lets PostgreSQL skip the monthly
+    partitions outside of the window.
     """
     @wraps(func)
     def wrapped(manager, *args, **kwargs):
         offset, limit = kwargs.pop('_offset', None), kwargs.pop('_limit', None)
+        cursor = kwargs.pop('_cursor', None)
+        since, until = kwargs.pop('_since', None), kwargs.pop('_until', None)
         qs = func(manager, *args, **kwargs)
         if isinstance(qs, dict):
             qs = manager.public(**qs)
         elif isinstance(qs, (list, tuple)):
             qs = manager.public(*qs)
+        if since is not None:
+            qs = qs.filter(timestamp__gte=since)
+        if until is not None:
+            qs = qs.filter(timestamp__lt=until)
+        if cursor is not None:
+            qs = keyset(qs, cursor)
         if offset or limit:
             qs = qs[offset:limit]
         return qs.fetch_generic_relations()
@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from threading import local
+
+from celery import shared_task
+from django.db import transaction
+
+from activity.actions import deserialize_actions, send_many, serialize_action
+
+
+_queue = local()
+
+
+@shared_task
+def send_many_task(payloads, batch_size=None):
+    """
+    Creates the actions serialized by ``serialize_action``.
+    """
+    return len(send_many(deserialize_actions(payloads), batch_size=batch_size))
+
+
+def send_many_async(actions, batch_size=None):
+    """
+    Queues the creation of many actions (see ``activity.actions.send_many``)
+    on Celery instead of inserting them on the request path.
+    """
+    return send_many_task.delay([serialize_action(**kwargs) for kwargs in actions], batch_size)
+
+
+def queue_action(payload):
+    """
+    Sends a serialized action to ``send_many_task`` once the current transaction
+    commits, or collects it in the enclosing ``batch()`` block.
+    """
+    payloads = getattr(_queue, 'payloads', None)
+    if payloads is None:
+        transaction.on_commit(lambda: send_many_task.delay([payload]))
+    else:
+        payloads.append(payload)
+
+
+@contextmanager
+def batch():
+    """
+    Collects the actions sent asynchronously in the block and hands them to a
+    single task, created with one bulk insert, once the block exits and the
+    current transaction commits.
+
+    Example::
+
+        with batch():
+            for order in orders:
+                action.send(request.user, verb='ordered', action_object=order)
+    """
+    if getattr(_queue, 'payloads', None) is not None:
+        yield
+        return
+    _queue.payloads = []
+    try:
+        yield
+    finally:
+        payloads, _queue.payloads = _queue.payloads, None
+        if payloads:
+            transaction.on_commit(lambda: send_many_task.delay(payloads))
+
+
+@shared_task
+def maintain_partitions_task():
+    """
+    Creates the coming monthly partitions of the Action table and archives the
+    expired ones, meant to be scheduled daily with Celery beat.
+    """
+    from activity import partitions
+    if not partitions.is_partitioned():
+        return []
+    return partitions.maintain_partitions()
+
+
+@shared_task
+def reconcile_follow_counts_task():
+    """
+    Fixes the follower counters that drifted from the follows, meant to be
+    scheduled with Celery beat. Returns the number of counters fixed.
+    """
+    from activity import follow_counts
+    return follow_counts.reconcile()
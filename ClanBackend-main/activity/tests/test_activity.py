@@ -1,12 +1,16 @@
 # -*- coding: utf-8  -*-
 from django.contrib.auth.models import Group
+from datetime import timedelta
+
+from django.db.models import Count
 
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import activate, get_language
 from django.urls import reverse
 
 from activity.models import (Action, Follow, model_stream, user_stream,
-                              actor_stream, following, followers)
+                              actor_stream, any_stream, following, followers,
+                              user_aggregated_stream)
 from activity.actions import follow, unfollow
 from activity.signals import action
 from activity.tests.base import DataTestCase, render
@@ -87,6 +91,52 @@ class ActivityTestCase(DataTestCase):
                             ['CoolGroup responded to admin: '
                              'Sweet Group!... %s ago' % self.timesince])
 
+    def test_any_stream(self):
+        self.assertSetEqual(any_stream(self.user2), [
+            'admin started following Two %s ago' % self.timesince,
+            'Two joined CoolGroup %s ago' % self.timesince,
+            'Two started following CoolGroup %s ago' % self.timesince,
+        ])
+        self.assertSetEqual(any_stream(self.user2, verb='joined'), [
+            'Two joined CoolGroup %s ago' % self.timesince,
+        ])
+
+    def test_user_aggregated_stream(self):
+        for _ in range(3):
+            action.send(self.user2, verb='joined', target=self.group, timestamp=self.testdate)
+        action.send(self.user2, verb='joined', target=self.group)
+        actions = list(user_aggregated_stream(self.user1))
+        self.assertEqual((actions[0].verb, actions[0].aggregated_count), ('joined', 1))
+        self.assertEqual(sorted((a.verb, a.aggregated_count) for a in actions[1:]), [
+            ('joined', 4), ('started following', 1),
+        ])
+        self.assertTrue(all(a.first_timestamp == a.timestamp for a in actions[1:]))
+        self.assertEqual(len(user_aggregated_stream(self.user1, period='month', verb='joined')), 2)
+        self.assertEqual(len(user_stream(self.user1)), 6)
+        # the manager's own aggregate is left alone
+        self.assertEqual(Action.objects.aggregate(count=Count('pk'))['count'], Action.objects.count())
+
+    def test_user_aggregated_stream_pages(self):
+        for minutes in range(1, 4):
+            action.send(self.user2, verb='joined', target=self.group,
+                        timestamp=self.testdate + timedelta(minutes=minutes))
+        expected = {a.pk: a.aggregated_count for a in user_aggregated_stream(self.user1)}
+
+        # the positions of the pages are applied outside of the windows
+        pages, cursor = {}, None
+        while True:
+            page = list(user_aggregated_stream(self.user1, _cursor=cursor, _limit=1))
+            if not page:
+                break
+            pages.update((a.pk, a.aggregated_count) for a in page)
+            cursor = page[-1]
+        self.assertEqual(pages, expected)
+        latest = user_aggregated_stream(self.user1)[0]
+        self.assertEqual(latest.aggregated_count, 4)
+        since = self.testdate + timedelta(minutes=2)
+        self.assertEqual([(a.pk, a.aggregated_count) for a in user_aggregated_stream(self.user1, _since=since)],
+                         [(latest.pk, 4)])
+
     def test_stream_with_flag(self):
         self.assertSetEqual(user_stream(self.user4, follow_flag='blacklisting'), [
             'Three liked activity %s ago' % self.timesince
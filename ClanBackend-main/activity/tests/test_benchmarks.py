@@ -0,0 +1,30 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+
+from activity.models import Action, Follow
+from activity.tests.base import DataTestCase
+
+
+class BenchmarkTestCase(DataTestCase):
+
+    def test_report(self):
+        actions, follows = Action.objects.count(), Follow.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('benchmark_activity', actions=50, follows=40, actors=10, repeat=2,
+                         only=['streams', 'follows', 'feeds.format'], output=path, stderr=StringIO())
+            with open(path) as f:
+                report = json.load(f)
+        self.assertGreaterEqual(report['actions'], actions + 50)
+        self.assertIn('streams.user', report['results'])
+        self.assertIn('follows.is_following_many', report['results'])
+        self.assertLess(report['results']['feeds.format']['queries'], 1)
+        self.assertNotIn('feeds.json.user', report['results'])
+        for result in report['results'].values():
+            self.assertEqual(set(result), {'p50', 'p95', 'p99', 'queries'})
+        # the generated data is rolled back
+        self.assertEqual((Action.objects.count(), Follow.objects.count()), (actions, follows))
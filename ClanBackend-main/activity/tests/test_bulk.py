@@ -0,0 +1,78 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from activity.actions import follow
+from activity.models import Action
+from activity.signals import action
+from activity.tasks import batch, send_many_async, send_many_task
+from activity.tests.base import DataTestCase
+
+
+class BulkSendTestCase(DataTestCase):
+
+    def test_send_many(self):
+        before = Action.objects.count()
+        with self.assertNumQueries(2):
+            created = action.send_many([
+                {'sender': self.user3, 'verb': 'joined', 'target': group}
+                for group in (self.group, self.another_group, self.group)
+            ], batch_size=2)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(Action.objects.count(), before + 3)
+        self.assertEqual(
+            [str(a.target) for a in Action.objects.filter(verb='joined', actor_object_id=self.user3.pk)],
+            ['CoolGroup', 'NiceGroup', 'CoolGroup'][::-1]
+        )
+
+    def test_bulk_send_unregistered(self):
+        self.assertRaises(ImproperlyConfigured, Action.objects.bulk_send, [
+            {'sender': self.user1, 'verb': 'joined', 'target': ContentType.objects.first()}
+        ])
+
+    def test_send_many_async(self):
+        with patch.object(send_many_task, 'delay') as delay:
+            send_many_async([
+                {'sender': self.user4, 'verb': 'liked', 'target': self.group, 'timestamp': self.testdate},
+                {'sender': self.user4, 'verb': 'liked', 'target': self.another_group},
+            ])
+        payloads, batch_size = json.loads(json.dumps(delay.call_args.args))
+        self.assertEqual(send_many_task(payloads, batch_size), 2)
+        actions = Action.objects.filter(verb='liked').order_by('timestamp')
+        self.assertEqual([a.target for a in actions], [self.group, self.another_group])
+        self.assertEqual(actions[0].timestamp.year, 2000)
+
+
+class AsyncActionTestCase(DataTestCase):
+
+    def setUp(self):
+        super(AsyncActionTestCase, self).setUp()
+        patcher = patch('activity.settings.ASYNC', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batched(self):
+        before = Action.objects.count()
+        with patch.object(send_many_task, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic(), batch():
+                    action.send(self.user3, verb='joined', target=self.group)
+                    follow(self.user3, self.another_group)
+                delay.assert_not_called()
+            self.assertEqual(Action.objects.count(), before)
+        self.assertEqual(delay.call_count, 1)
+        payloads, = json.loads(json.dumps(delay.call_args.args))
+        self.assertEqual(len(payloads), 2)
+
+        send_many_task(payloads)
+        self.assertEqual(Action.objects.count(), before + 2)
+        self.assertTrue(Action.objects.filter(verb='started following', target_object_id=self.another_group.pk))
+
+    def test_sent_on_commit(self):
+        with patch.object(send_many_task, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=False):
+                action.send(self.user3, verb='joined', target=self.group)
+        delay.assert_not_called()
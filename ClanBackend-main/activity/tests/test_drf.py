@@ -116,6 +116,14 @@ class DRFActionTestCase(BaseDRFTestCase):
         assert len(actions) == 2
         assert actions[0]['actor']['username'] == actions[1]['actor']['username'] == 'Two'
 
+    def test_following_aggregated(self):
+        signals.action.send(self.user2, verb='joined', target=self.group, timestamp=self.testdate)
+        url = reverse('action-following-aggregated')
+        actions = self.get(url, auth=True)
+        assert len(actions) == 2
+        assert sorted(action['aggregated_count'] for action in actions) == [1, 2]
+        assert self.auth_client.get(url, {'period': 'century'}).status_code == 400
+
     def test_action_send(self):
         body = {
             'verb': 'mentioned',
@@ -132,6 +140,34 @@ class DRFActionTestCase(BaseDRFTestCase):
         assert action.target == self.group
 
 
+@skipUnless(USE_DRF, 'Django rest framework disabled')
+class DRFCursorPaginationTestCase(BaseDRFTestCase):
+    def paginate(self, **params):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from activity.drf.pagination import ActionCursorPagination
+
+        paginator = ActionCursorPagination()
+        request = Request(APIRequestFactory().get(reverse('action-list'), params))
+        page = paginator.paginate_queryset(Action.objects.public(), request)
+        return page, paginator.get_next_link()
+
+    def test_pages(self):
+        page, next_link = self.paginate(page_size=4)
+        assert len(page) == 4
+        ids = [action.id for action in page]
+        while next_link:
+            page, next_link = self.paginate(page_size=4, cursor=next_link.split('cursor=')[1].split('&')[0])
+            ids += [action.id for action in page]
+        assert ids == list(Action.objects.public().order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def test_invalid_cursor(self):
+        from rest_framework.exceptions import NotFound
+
+        with self.assertRaises(NotFound):
+            self.paginate(cursor='nope')
+
+
 @skipUnless(USE_DRF, 'Django rest framework disabled')
 class DRFFollowTestCase(BaseDRFTestCase):
     def test_follow(self):
@@ -158,6 +194,15 @@ class DRFFollowTestCase(BaseDRFTestCase):
         data = loads(resp.data)
         assert data['is_following']
 
+    def test_is_following_many(self):
+        objects = f'{self.site_ct.id}:{self.comment.id},{self.user_ct.id}:{self.user2.id},{self.user_ct.id}:0'
+        data = self.get(reverse('follow-is-following-many'), {'objects': objects}, auth=True)
+        assert data == {
+            f'{self.site_ct.id}:{self.comment.id}': False,
+            f'{self.user_ct.id}:{self.user2.id}': True,
+            f'{self.user_ct.id}:0': False,
+        }
+
     def test_followers(self):
         followers = self.auth_client.get(reverse('follow-followers')).data
         assert len(followers) == 1
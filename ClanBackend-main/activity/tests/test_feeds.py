@@ -1,6 +1,16 @@
+from datetime import timedelta
+
 from django.conf import settings
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.feedgenerator import rfc3339_date
+from django.urls import reverse
+from unittest.mock import patch
 
+from activity.actions import follow, unfollow
+from activity.feeds import FeedContext, ModelJSONActivityFeed, UserActivityMixin
+from activity.signals import action
 from activity.tests import base
 
 
@@ -78,3 +88,111 @@ class FeedsTestCase(base.DataTestCase):
             self.user_ct.pk, self.user2.pk
         )
         self.assertEqual(len(json['items']), 3)
+
+    def test_json_feed_cursor(self):
+        first = self.capture('actstream_model_feed_json', self.user_ct.pk, query_string='limit=4')
+        self.assertEqual(len(first['items']), 4)
+        self.assertIn('cursor=', first['next'])
+        seen = [item['id'] for item in first['items']]
+        response = self.client.get(first['next'])
+        second = self.assertJSON(response.content.decode())
+        self.assertEqual(len(second['items']), 4)
+        self.assertFalse(set(seen) & {item['id'] for item in second['items']})
+        response = self.client.get(second['next'])
+        third = self.assertJSON(response.content.decode())
+        self.assertEqual(len(third['items']), 2)
+        self.assertIsNone(third['next'])
+
+    def test_feed_queries(self):
+        def count(viewname):
+            with CaptureQueriesContext(connection) as context:
+                self.capture(viewname, self.user_ct.pk)
+            return len(context)
+
+        count('actstream_model_feed')  # warm the site and content type caches
+        before = count('actstream_model_feed'), count('actstream_model_feed_json')
+        for i in range(30):
+            user = self.User.objects.create_user('user%d' % i)
+            action.send(user, verb='joined', target=self.another_group)
+        self.assertEqual((count('actstream_model_feed'), count('actstream_model_feed_json')), before)
+
+    def test_streaming_json_feed(self):
+        request = RequestFactory().get('/')
+        request.user = self.user1
+        view = ModelJSONActivityFeed.as_view(streaming=True, chunk_size=3)
+        response = view(request, content_type_id=self.user_ct.pk)
+        self.assertTrue(response.streaming)
+        streamed = self.assertJSON(b''.join(response.streaming_content).decode())
+        expected = self.capture('actstream_model_feed_json', self.user_ct.pk)
+        self.assertEqual(streamed, expected)
+
+    def test_conditional_get(self):
+        self.client.login(username='admin', password='admin')
+        for viewname in ('actstream_feed_atom', 'actstream_feed_json'):
+            url = reverse(viewname)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            self.assertIn('Last-Modified', response)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(len([q for q in context if 'activity_action' in q['sql']]), 1)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+
+            action.send(self.user2, verb='joined', target=self.another_group)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_get_follows(self):
+        self.client.login(username='admin', password='admin')
+        user = self.User.objects.create_user('Five')
+        action.send(user, verb='joined', target=self.group, timestamp=self.testdate - timedelta(days=1))
+        for viewname, change in (('actstream_feed_atom', lambda: follow(self.user1, user, send_action=False)),
+                                 ('actstream_feed_json', lambda: unfollow(self.user1, user))):
+            url = reverse(viewname)
+            etag = self.client.get(url)['ETag']
+            # the newest action stays the same, the actions shown do not
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_feed_object_fetched_once(self):
+        self.client.login(username='admin', password='admin')
+        with patch.object(UserActivityMixin, 'get_object', autospec=True,
+                          side_effect=UserActivityMixin.get_object) as get_object:
+            self.assertEqual(self.client.get(reverse('actstream_feed_atom')).status_code, 200)
+        self.assertEqual(get_object.call_count, 1)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_feed_cache(self):
+        patcher = patch('activity.settings.FEED_CACHE', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        url = reverse('actstream_model_feed_json', args=[self.user_ct.pk])
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len([q for q in context if 'activity_action' in q['sql']]), 1)
+        action.send(self.user3, verb='joined', target=self.another_group)
+        self.assertNotEqual(self.client.get(url).content, first.content)
+
+    def test_feed_context(self):
+        context = FeedContext()
+        self.assertEqual(context.get_url(self.join_action),
+                         reverse('actstream_detail', args=[self.join_action.pk]))
+        self.comment.pk = 'a b@c'
+        self.assertEqual(context.get_url(self.join_action, self.comment),
+                         reverse('actstream_actor', args=[self.site_ct.pk, 'a b@c']))
+        with self.assertNumQueries(0):
+            self.assertEqual(context.content_type(self.user1), (self.user_ct.pk, self.user_ct.name))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('actstream_model_feed_json', args=[self.user_ct.pk]), {'cursor': 'nope'})
+        self.assertEqual(response.status_code, 404)
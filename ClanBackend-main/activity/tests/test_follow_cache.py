@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import override_settings
+
+from activity.actions import follow, is_following, unfollow
+from activity.models import Follow, followers, following
+from activity.tests.base import DataTestCase
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FollowCacheTestCase(DataTestCase):
+
+    def setUp(self):
+        super(FollowCacheTestCase, self).setUp()
+        caches['default'].clear()
+        patcher = patch('activity.settings.FOLLOW_CACHE', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_is_following(self):
+        self.assertTrue(is_following(self.user1, self.user2))
+        with self.assertNumQueries(0):
+            self.assertTrue(Follow.objects.is_following(self.user1, self.user2))
+            self.assertFalse(is_following(self.user1, self.group))
+        self.assertTrue(is_following(self.user4, self.another_group, flag='liking'))
+        self.assertFalse(is_following(self.user4, self.another_group, flag='blacklisting'))
+
+    def test_is_following_many(self):
+        objects = [self.user2, self.group, self.another_group, self.user3]
+        expected = [True, False, False, False]
+        self.assertEqual(Follow.objects.is_following_many(self.user1, objects), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(Follow.objects.is_following_many(self.user1, objects), expected)
+        with patch('activity.settings.FOLLOW_CACHE', None), self.assertNumQueries(1):
+            self.assertEqual(Follow.objects.is_following_many(self.user1, objects), expected)
+
+    def test_follow_unfollow(self):
+        self.assertFalse(is_following(self.user3, self.group))
+        self.assertEqual(list(followers(self.group)), [self.user2])
+        follow(self.user3, self.group, send_action=False)
+        self.assertTrue(is_following(self.user3, self.group))
+        self.assertSetEqual(followers(self.group), ['Two', 'Three'])
+        self.assertEqual(following(self.user3), [self.group])
+        unfollow(self.user3, self.group)
+        self.assertFalse(is_following(self.user3, self.group))
+        self.assertEqual(list(followers(self.group)), [self.user2])
+        self.assertEqual(following(self.user3), [])
+
+    def test_invalidated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            follow(self.user3, self.group, send_action=False)
+            # a concurrent reader caching the follows before the commit
+            caches['default'].set('activity:following:%s' % self.user3.pk, ())
+        self.assertTrue(is_following(self.user3, self.group))
+
+    def test_following_order(self):
+        follow(self.user3, self.group, send_action=False)
+        follow(self.user3, self.user1, send_action=False)
+        follow(self.user3, self.another_group, send_action=False)
+        expected = [self.group, self.user1, self.another_group]
+        self.assertEqual(following(self.user3), expected)
+        with patch('activity.settings.FOLLOW_CACHE', None):
+            self.assertEqual(following(self.user3), expected)
+
+    def test_orphaned(self):
+        self.assertTrue(is_following(self.user2, self.group))
+        self.assertEqual(list(followers(self.group)), [self.user2])
+        group_pk = self.group.pk
+        self.group.delete()
+        self.group.pk = group_pk
+        self.assertFalse(is_following(self.user2, self.group))
+        self.assertEqual(list(followers(self.group)), [])
@@ -1,9 +1,14 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Group
 
+from activity.gfk import GFKResolver, cache_key
 from activity.models import Action
+from activity.registry import register, registry, unregister
 from activity.tests.base import LTE
 
 
@@ -95,3 +100,81 @@ class GFKManagerTestCase(TestCase):
             (a.id, a.actor, a.target) for a in generic()]
         self.assertEqual(action_actor_targets,
                          action_actor_targets_fetch_generic_target)
+
+    def test_resolver_batches_per_content_type(self):
+        resolver = GFKResolver()
+        actions = Action.objects.all().fetch_generic_relations(resolver=resolver)
+        # the actions and one query each for users and groups, whatever the relation
+        self.assertNumQueries(3, lambda: [(a.actor, a.target) for a in actions])
+        self.assertEqual(resolver.queries, 2)
+
+        # objects are memoized by the resolver
+        actions = Action.objects.all().fetch_generic_relations(resolver=resolver)
+        self.assertNumQueries(1, lambda: [(a.actor, a.target) for a in actions])
+        self.assertEqual(actions[0].target, self.group)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class GFKCacheTestCase(GFKManagerTestCase):
+
+    def setUp(self):
+        super(GFKCacheTestCase, self).setUp()
+        caches['default'].clear()
+        for patcher in (
+            patch('activity.settings.GFK_CACHE', 'default'),
+            patch('activity.settings.GFK_CACHE_FIELDS', {'auth.user': ['username'], 'auth.group': ['name']}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for model in (get_user_model(), Group):
+            if model not in registry:
+                register(model)
+                self.addCleanup(unregister, model)
+
+    def test_cached_objects(self):
+        list(Action.objects.all().fetch_generic_relations())
+        resolver = GFKResolver()
+        actions = Action.objects.all().fetch_generic_relations(resolver=resolver)
+        self.assertNumQueries(1, lambda: [(a.actor, a.target) for a in actions])
+        self.assertEqual(resolver.queries, 0)
+        self.assertEqual(resolver.cache_hits, 5)
+
+    def test_invalidation(self):
+        list(Action.objects.all().fetch_generic_relations())
+        self.group.name = 'CoolerGroup'
+        self.group.save()
+        resolver = GFKResolver()
+        targets = [a.target for a in Action.objects.all().fetch_generic_relations(resolver=resolver)]
+        self.assertIn('CoolerGroup', [str(target) for target in targets])
+        self.assertEqual(resolver.queries, 1)
+
+    def test_cached_fields(self):
+        list(Action.objects.all().fetch_generic_relations())
+        cached = caches['default'].get(cache_key(self.user_ct.pk, self.user1.pk))
+        self.assertEqual(cached, {'id': self.user1.pk, 'username': 'admin'})
+
+        action = Action.objects.filter(target_object_id=self.user2.pk).fetch_generic_relations(
+            resolver=GFKResolver()
+        )[0]
+        self.assertEqual(action.actor.username, 'admin')
+        self.assertEqual(action.actor.get_deferred_fields(), {
+            f.attname for f in get_user_model()._meta.concrete_fields
+        } - {'id', 'username'})
+        self.assertNumQueries(1, lambda: action.actor.password)
+
+    def test_uncached_models(self):
+        with patch('activity.settings.GFK_CACHE_FIELDS', {'auth.user': ['username']}):
+            list(Action.objects.all().fetch_generic_relations())
+        self.assertIsNone(caches['default'].get(cache_key(self.group_ct.pk, self.group.pk)))
+        self.assertIsNotNone(caches['default'].get(cache_key(self.user_ct.pk, self.user1.pk)))
+
+    def test_unregistered_models(self):
+        unregister(Group)
+        list(Action.objects.all().fetch_generic_relations())
+        key = cache_key(self.group_ct.pk, self.group.pk)
+        self.assertIsNone(caches['default'].get(key))
+
+        # nor are their saves listened to
+        caches['default'].set(key, {'id': self.group.pk, 'name': 'CoolGroup'})
+        self.group.save()
+        self.assertIsNotNone(caches['default'].get(key))
@@ -0,0 +1,51 @@
+import gzip
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import skipUnless
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.utils.timezone import now
+
+from activity import partitions
+from activity.models import Action, actor_stream
+from activity.signals import action
+from activity.tests.base import DataTestCase
+
+
+class PartitionsTestCase(DataTestCase):
+
+    def test_months(self):
+        date = datetime(2024, 11, 17, 10, tzinfo=timezone.utc)
+        self.assertEqual(partitions.month_start(date), datetime(2024, 11, 1, tzinfo=timezone.utc))
+        self.assertEqual(partitions.add_months(date, 2), datetime(2025, 1, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(partitions.add_months(date, -11), datetime(2023, 12, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(partitions.partition_name(date), '%s_p2024_11' % Action._meta.db_table)
+
+    def test_stream_window(self):
+        action.send(self.user1, verb='logged in')
+        self.assertEqual(len(actor_stream(self.user1)), 4)
+        self.assertEqual([a.verb for a in actor_stream(self.user1, _since=now() - timedelta(days=1))],
+                         ['logged in'])
+        self.assertEqual(len(actor_stream(self.user1, _until=now() - timedelta(days=1))), 3)
+
+    @skipUnless(connection.vendor != 'postgresql', 'Requires a database without partitioning')
+    def test_commands_require_postgresql(self):
+        self.assertRaises(CommandError, call_command, 'partition_actions')
+        self.assertRaises(CommandError, call_command, 'archive_actions')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Partitioning requires PostgreSQL')
+    def test_partition_and_archive(self):
+        count = Action.objects.count()
+        call_command('partition_actions', stdout=tempfile.TemporaryFile('w+'))
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(Action.objects.count(), count)
+        action.send(self.user1, verb='logged in')
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = partitions.maintain_partitions(retention_months=1, storage=FileSystemStorage(directory))
+            self.assertEqual(len(paths), 1)
+            with gzip.open(FileSystemStorage(directory).path(paths[0]), 'rt') as f:
+                self.assertEqual(len(f.readlines()), count + 1)
+        self.assertEqual(Action.objects.count(), 1)
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from activity import routers
+from activity.actions import follow, unfollow
+from activity.models import Action, Follow
+from activity.signals import action
+from activity.tests.base import DataTestCase
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReplicaRouterTestCase(DataTestCase):
+
+    def setUp(self):
+        super(ReplicaRouterTestCase, self).setUp()
+        for name, value in (('REPLICAS', ['replica']), ('REPLICA_PIN_SECONDS', 60)):
+            patcher = patch('activity.settings.%s' % name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # the test case runs in a transaction, which always reads from the primary
+        self.outside_transaction = patch('activity.routers.connections',
+                                         {'default': SimpleNamespace(in_atomic_block=False)})
+        self.addCleanup(routers._pinned_until.set, 0)
+        caches['default'].clear()
+        self.router = routers.ReplicaRouter()
+
+    def read(self, user=None):
+        """
+        Returns the databases of reads of actions and follows during a request of the user.
+        """
+        databases = []
+
+        def view(request):
+            request.user = user
+            databases.extend([self.router.db_for_read(Action), self.router.db_for_read(Follow)])
+            return HttpResponse()
+        routers.ReplicaPinningMiddleware(view)(RequestFactory().get('/'))
+        return databases
+
+    def test_routing(self):
+        with self.outside_transaction:
+            self.assertEqual(self.router.db_for_read(Action), 'replica')
+            self.assertIsNone(self.router.db_for_read(Group))
+        self.assertIsNone(self.router.db_for_read(Action))
+        self.assertFalse(self.router.allow_migrate('replica', 'activity'))
+        self.assertIsNone(self.router.allow_migrate('default', 'activity'))
+
+    def test_read_your_writes(self):
+        with self.outside_transaction:
+            self.assertEqual(self.read(self.user3), ['replica', 'replica'])
+            follow(self.user3, self.another_group)
+            self.assertEqual(self.router.db_for_read(Action), None)
+            routers._pinned_until.set(0)
+            self.assertEqual(self.read(self.user3), [None, None])
+            self.assertEqual(self.read(self.user2), ['replica', 'replica'])
+            self.assertEqual(self.read(), ['replica', 'replica'])
+
+    def test_action_of_other_actors(self):
+        with self.outside_transaction:
+            action.send(self.group, verb='was renamed')
+            self.assertEqual(self.router.db_for_read(Action), 'replica')
+
+            def view(request):
+                request.user = self.user3
+                action.send(self.group, verb='was renamed')
+                return HttpResponse()
+            routers.ReplicaPinningMiddleware(view)(RequestFactory().get('/'))
+            self.assertEqual(self.read(self.user3), [None, None])
+            self.assertEqual(self.read(self.user2), ['replica', 'replica'])
+
+    def test_unfollow_reads_primary(self):
+        databases = []
+        with self.outside_transaction, patch('activity.settings.USE_FOLLOW_COUNTS', True), \
+                patch('activity.follow_counts.removed', lambda qs: databases.append(self.router.db_for_read(Follow))):
+            unfollow(self.user1, self.user2)
+        self.assertEqual(databases, [None])
+
+    def test_disabled(self):
+        with patch('activity.settings.REPLICAS', []), self.outside_transaction:
+            follow(self.user3, self.another_group)
+            self.assertIsNone(self.router.db_for_read(Action))
+            self.assertEqual(self.read(self.user3), [None, None])
@@ -0,0 +1,71 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from activity.actions import follow, unfollow
+from activity.models import Action, Timeline, user_stream
+from activity.signals import action
+from activity.tests.base import DataTestCase
+
+
+class TimelinesTestCase(DataTestCase):
+
+    def setUp(self):
+        patcher = patch('activity.settings.USE_TIMELINES', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(TimelinesTestCase, self).setUp()
+
+    def test_fan_out(self):
+        created = action.send(self.user2, verb='left', target=self.group)[0][1]
+        self.assertTrue(Timeline.objects.filter(user=self.user1, action=created).exists())
+        self.assertFalse(Timeline.objects.filter(user=self.user3, action=created).exists())
+
+    def test_stream(self):
+        self.assertSetEqual(user_stream(self.user1), [
+            'Two started following CoolGroup %s ago' % self.timesince,
+            'Two joined CoolGroup %s ago' % self.timesince,
+        ])
+        self.assertSetEqual(user_stream(self.user2),
+                            ['CoolGroup responded to admin: '
+                             'Sweet Group!... %s ago' % self.timesince])
+
+    def test_stream_matches_follows(self):
+        for user in (self.user1, self.user2, self.user3, self.user4):
+            self.assertSetEqual(
+                user_stream(user), map(str, user_stream(user, use_timeline=False))
+            )
+
+    def test_with_user_activity(self):
+        self.assertIn(self.join_action,
+                      list(user_stream(self.user1, with_user_activity=True)))
+
+    def test_unfollow(self):
+        unfollow(self.user1, self.user2)
+        self.assertFalse(Timeline.objects.filter(user=self.user1).exists())
+        self.assertFalse(user_stream(self.user1))
+
+    def test_unfollow_overlapping(self):
+        # user2 joining the group stays in the timeline through the follow of the group
+        joined = Action.objects.actor(self.user2).get(verb='joined')
+        follow(self.user1, self.group, actor_only=False, send_action=False)
+        unfollow(self.user1, self.user2, send_action=False)
+        self.assertTrue(Timeline.objects.filter(user=self.user1, action=joined).exists())
+        self.assertSetEqual(user_stream(self.user1), map(str, user_stream(self.user1, use_timeline=False)))
+
+    def test_fanout_limit(self):
+        with patch('activity.settings.TIMELINE_FANOUT_LIMIT', 0):
+            created = action.send(self.user2, verb='left', target=self.group)[0][1]
+            self.assertFalse(Timeline.objects.filter(action=created).exists())
+            self.assertIn(created, list(user_stream(self.user1)))
+
+    def test_backfill_command(self):
+        Timeline.objects.all().delete()
+        follow(self.user3, self.group, actor_only=False, send_action=False)
+        Timeline.objects.all().delete()
+        call_command('backfill_timelines', stdout=StringIO())
+        for user in (self.user1, self.user2, self.user3):
+            self.assertSetEqual(
+                user_stream(user), map(str, user_stream(user, use_timeline=False))
+            )
@@ -0,0 +1,46 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from activity.actions import is_following
+from activity.models import Action, Follow, any_stream, user_stream
+from activity.tests.base import DataTestCase
+
+
+class TypedIdsTestCase(DataTestCase):
+
+    def setUp(self):
+        patcher = patch('activity.settings.USE_TYPED_IDS', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(TypedIdsTestCase, self).setUp()
+
+    def test_stored(self):
+        self.assertEqual(self.join_action.actor_object_int_id, self.user1.pk)
+        self.assertEqual(self.join_action.target_object_int_id, self.group.pk)
+        self.assertIsNone(self.join_action.action_object_object_int_id)
+        self.assertFalse(Follow.objects.filter(object_int_id__isnull=True).exists())
+
+    def test_streams(self):
+        self.assertSetEqual(user_stream(self.user1), [
+            'Two started following CoolGroup %s ago' % self.timesince,
+            'Two joined CoolGroup %s ago' % self.timesince,
+        ])
+        self.assertEqual(len(any_stream(self.user2)), 3)
+
+    def test_is_following(self):
+        self.assertTrue(is_following(self.user1, self.user2))
+        self.assertTrue(Follow.objects.is_following(self.user2, self.group))
+        self.assertFalse(Follow.objects.is_following(self.user1, self.group))
+        self.assertEqual(list(Follow.objects.followers(self.group)), [self.user2])
+
+    def test_backfill_command(self):
+        Action.objects.update(actor_object_int_id=None, target_object_int_id=None)
+        Follow.objects.update(object_int_id=None)
+        call_command('backfill_typed_ids', stdout=StringIO())
+        self.assertFalse(Action.objects.filter(actor_object_int_id__isnull=True).exists())
+        self.assertFalse(Follow.objects.filter(object_int_id__isnull=True).exists())
+        self.assertEqual(
+            Action.objects.get(pk=self.join_action.pk).target_object_int_id, self.group.pk
+        )
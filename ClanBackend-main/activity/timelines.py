@@ -0,0 +1,115 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from activity import settings
+from activity.typed_ids import content_type_lookup
+
+
+def follows_for(content_type_id, object_id):
+    """
+    Returns a queryset of Follow objects pointing at the given object.
+    """
+    return apps.get_model('activity', 'follow').objects.filter(
+        content_type_id=content_type_id, **content_type_lookup('object', content_type_id, object_id)
+    )
+
+
+def exceeds_fanout_limit(content_type_id, object_id):
+    """
+    Returns True if the object has more followers than
+    ACTIVITY_SETTINGS['TIMELINE_FANOUT_LIMIT'].
+    Actions of such objects are read at query time instead of being
+    written to every follower's timeline.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    return follows_for(content_type_id, object_id)[:limit + 1].count() > limit
+
+
+def heavy_follows(follows):
+    """
+    Filters a Follow queryset down to the objects exceeding the fan-out limit.
+    """
+    followers_count = apps.get_model('activity', 'follow').objects.filter(
+        content_type_id=OuterRef('content_type_id'), object_id=OuterRef('object_id')
+    ).order_by().values('content_type_id').annotate(count=Count('pk')).values('count')
+    return follows.annotate(
+        followers_count=Subquery(followers_count)
+    ).filter(followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+
+
+def recipients(action):
+    """
+    Returns the ids of the users whose timeline should receive the action.
+    Followers of the actor always receive it, followers of the target and
+    action_object only when they did not follow with ``actor_only``.
+    """
+    q = Q()
+    for field in ('actor', 'target', 'action_object'):
+        content_type_id = getattr(action, '%s_content_type_id' % field)
+        object_id = getattr(action, '%s_object_id' % field)
+        if content_type_id is None or exceeds_fanout_limit(content_type_id, object_id):
+            continue
+        clause = Q(content_type_id=content_type_id,
+                   **content_type_lookup('object', content_type_id, object_id))
+        if field != 'actor':
+            clause &= Q(actor_only=False)
+        q |= clause
+
+    Follow = apps.get_model('activity', 'follow')
+    if not q:
+        return Follow.objects.none()
+    return Follow.objects.filter(q).order_by().values_list('user_id', flat=True).distinct()
+
+
+def fan_out(action):
+    """
+    Writes the action into the timeline of every follower of its actor,
+    target and action_object.
+    """
+    if not action.public:
+        return []
+    Timeline = apps.get_model('activity', 'timeline')
+    return Timeline.objects.bulk_create([
+        Timeline(user_id=user_id, action_id=action.pk, timestamp=action.timestamp)
+        for user_id in recipients(action)
+    ], ignore_conflicts=True)
+
+
+def backfill(user, actions, size=None):
+    """
+    Copies the most recent ``size`` actions of the given queryset into the
+    user's timeline.
+    """
+    if size is None:
+        size = settings.TIMELINE_BACKFILL_SIZE
+    Timeline = apps.get_model('activity', 'timeline')
+    actions = actions.prefetch_related(None).order_by('-timestamp', '-id')
+    return Timeline.objects.bulk_create([
+        Timeline(user_id=user.pk, action_id=action_id, timestamp=timestamp)
+        for action_id, timestamp in actions.values_list('pk', 'timestamp')[:size]
+    ], ignore_conflicts=True)
+
+
+def follow(user, obj, actor_only=True):
+    """
+    Backfills the user's timeline with the recent actions of a newly followed object.
+    """
+    if exceeds_fanout_limit(ContentType.objects.get_for_model(obj).pk, obj.pk):
+        return []
+    Action = apps.get_model('activity', 'action')
+    if actor_only:
+        return backfill(user, Action.objects.actor(obj))
+    return backfill(user, Action.objects.any(obj))
+
+
+def unfollow(user, obj):
+    """
+    Removes the actions of an unfollowed object from the user's timeline,
+    except those the user still receives through the remaining follows.
+    """
+    Action = apps.get_model('activity', 'action')
+    still_followed = Action.objects.user(user, use_timeline=False).prefetch_related(None)
+    return apps.get_model('activity', 'timeline').objects.filter(
+        user=user, action__in=Action.objects.any(obj).prefetch_related(None).values('pk')
+    ).exclude(action__in=still_followed.values('pk')).delete()
@@ -0,0 +1,74 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+from activity import settings
+
+
+TYPED_ID_FIELDS = {
+    'int': '%s_int_id',
+    'uuid': '%s_uuid',
+}
+
+
+def id_type(model_class):
+    """
+    Returns ``'int'`` or ``'uuid'`` for models whose primary key can be stored
+    in a typed id column, None otherwise.
+    """
+    if model_class is None:
+        return None
+    pk = model_class._meta.pk
+    while pk.is_relation:
+        pk = pk.target_field
+    if isinstance(pk, models.UUIDField):
+        return 'uuid'
+    if isinstance(pk, models.IntegerField):
+        return 'int'
+    return None
+
+
+def field_name(prefix, model_class):
+    """
+    Returns the name of the column holding the ids of ``model_class`` for the
+    generic foreign key ``prefix`` (eg ``actor_object`` or ``object``).
+    That is the typed column when ACTIVITY_SETTINGS['USE_TYPED_IDS'] is enabled
+    and the model has an integer or UUID primary key, the char column otherwise.
+    """
+    kind = settings.USE_TYPED_IDS and id_type(model_class)
+    if kind:
+        return TYPED_ID_FIELDS[kind] % prefix
+    return '%s_id' % prefix
+
+
+def lookup(prefix, model_class, object_id):
+    """
+    Returns the filter keyword arguments matching ``object_id`` of ``model_class``.
+    """
+    return {field_name(prefix, model_class): object_id}
+
+
+def object_lookup(prefix, obj):
+    """
+    Returns the filter keyword arguments matching the given object.
+    """
+    return lookup(prefix, obj.__class__, obj.pk)
+
+
+def content_type_lookup(prefix, content_type_id, object_id):
+    """
+    Returns the filter keyword arguments matching ``object_id`` of the model of a content type.
+    """
+    model_class = ContentType.objects.get_for_id(content_type_id).model_class()
+    return lookup(prefix, model_class, object_id)
+
+
+def values(prefix, obj):
+    """
+    Returns the typed id column values to store along the char id of ``obj``.
+    """
+    if obj is None or not settings.USE_TYPED_IDS:
+        return {}
+    kind = id_type(obj.__class__)
+    if not kind:
+        return {}
+    return {TYPED_ID_FIELDS[kind] % prefix: obj.pk}
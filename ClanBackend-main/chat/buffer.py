@@ -0,0 +1,83 @@
+import asyncio
+import json
+from weakref import WeakKeyDictionary
+
+import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+PENDING_KEY = 'chat:pending'
+LOCK_KEY = 'chat:pending:lock'
+# how long a worker may hold the drain lock, in seconds, in case it dies
+LOCK_TIMEOUT = 60
+
+# one client per event loop, its connections cannot be shared between loops
+_clients = WeakKeyDictionary()
+
+
+def get_interval():
+    return getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL', 0.05)
+
+
+def get_batch_size():
+    return getattr(settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', 100)
+
+
+def get_url():
+    return getattr(settings, 'CHAT_WRITE_BEHIND_REDIS_URL', 'redis://localhost:6379/5')
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = redis.asyncio.from_url(get_url())
+    return _clients[loop]
+
+
+async def add(message):
+    """
+    Appends a message to the write-behind buffer of the chat messages.
+
+    Messages are broadcast as soon as they are received and appended to a
+    Redis list, where they survive a crash or a redeploy of the consumers.
+    A Celery worker saves them in batches, ``CHAT_WRITE_BEHIND_INTERVAL``
+    seconds after the first pending message and whenever
+    ``CHAT_WRITE_BEHIND_BATCH_SIZE`` more are pending, see ``drain``. The
+    timestamps are set on receipt, so the order of the messages does not
+    depend on when they are saved.
+    """
+    from .tasks import save_pending_messages_task
+    pending = await get_async_client().rpush(PENDING_KEY, json.dumps(message))
+    if pending == 1:
+        await sync_to_async(save_pending_messages_task.apply_async)(countdown=get_interval())
+    elif pending % get_batch_size() == 0:
+        await sync_to_async(save_pending_messages_task.delay)()
+
+
+def drain(client=None):
+    """
+    Saves the pending messages, ``CHAT_WRITE_BEHIND_BATCH_SIZE`` at a time,
+    unless another worker is already at it. A batch is removed from the list
+    only once saved, and saving skips the messages already saved by uid, so
+    a worker dying midway loses nothing. Returns the number of messages saved.
+    """
+    from .tasks import save_messages
+    client = client or redis.from_url(get_url())
+    batch_size, saved = get_batch_size(), 0
+    while client.set(LOCK_KEY, 1, nx=True, ex=LOCK_TIMEOUT):
+        try:
+            while True:
+                batch = client.lrange(PENDING_KEY, 0, batch_size - 1)
+                if not batch:
+                    break
+                save_messages([json.loads(message) for message in batch])
+                client.ltrim(PENDING_KEY, len(batch), -1)
+                saved += len(batch)
+        finally:
+            client.delete(LOCK_KEY)
+        # a message added after the last batch was read and before the lock
+        # was released did not schedule a drain of its own
+        if not client.llen(PENDING_KEY):
+            break
+    return saved
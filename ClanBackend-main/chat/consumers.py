@@ -1,12 +1,14 @@
 import json
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .models import Room, Message
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import datetime
 from celery import shared_task
-from .tasks import create_message_task 
+from . import buffer
 User = get_user_model()
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -42,9 +44,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
             sender = self.user
             receiver = await self.get_reciever(room, sender)
 
-            message = await self.create_message(
-                room, sender, receiver, content, message_type
-            )
+            if getattr(settings, 'CHAT_WRITE_BEHIND', False):
+                message = await self.buffer_message(
+                    room, sender, receiver, content, message_type
+                )
+            else:
+                message = await self.create_message(
+                    room, sender, receiver, content, message_type
+                )
 
         elif action in ["receiving", "reading", "editing"]:
             message_uuid = text_data_json['uuid']
@@ -70,16 +77,29 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def get_room(self):
-        return Room.objects.get(uuid=self.room_uuid)
+        return Room.objects.get(uid=self.room_uuid)
     
     @database_sync_to_async
     def get_reciever(self, room, sender):
         return room.members.exclude(id=sender.id).first()
 
+    def get_message(self, uid):
+        """
+        Returns the message with the uid, saving the pending messages of the
+        write-behind buffer first if it is still waiting there.
+        """
+        try:
+            return Message.objects.get(uid=uid)
+        except Message.DoesNotExist:
+            if not getattr(settings, 'CHAT_WRITE_BEHIND', False):
+                raise
+        buffer.drain()
+        return Message.objects.get(uid=uid)
+
     @database_sync_to_async
     def edit_message(self, uuid, content):
         try:
-            message = Message.objects.get(uuid=uuid)
+            message = self.get_message(uuid)
             old_content = json.loads(message.old_content or '{"messages": []}')
             old_messages = old_content["messages"] + [message.message]
             message.old_content = json.dumps({
@@ -94,7 +114,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message.is_sent = True
             message.save()
             return {
-                "uuid": str(message.uuid),
+                "uuid": str(message.uid),
                 "is_edited": message.is_edited,
                 "is_read": message.is_read,
                 "is_sent": message.is_sent,
@@ -110,7 +130,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def update_message(self, uuid, action):
         try:
-            message = Message.objects.get(uuid=uuid)
+            message = self.get_message(uuid)
             if message and self.user == message.receiver:
                 if action == "reading":
                     message.is_received = True
@@ -119,7 +139,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     message.reading_datetime = datetime.now()
                     message.save()
                     return {
-                        "uuid": str(message.uuid),
+                        "uuid": str(message.uid),
                         "is_read": message.is_read,
                         "is_received": message.is_received,
                         "receiving_datetime": message.receiving_datetime.isoformat(),
@@ -130,7 +150,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     message.receiving_datetime = datetime.now()
                     message.save()
                     return {
-                        "uuid": str(message.uuid),
+                        "uuid": str(message.uid),
                         "is_received": message.is_received,
                         "receiving_datetime": message.receiving_datetime.isoformat(),
                     }
@@ -139,6 +159,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 "error": "Can't find message",
             }
 
+    async def buffer_message(self, room, sender, receiver, content, message_type):
+        """
+        Returns the payload of a new message right away and leaves saving it
+        to the write-behind buffer, see chat.buffer.
+        """
+        now = timezone.now().isoformat()
+        message = {
+            "uid": str(uuid.uuid4()),
+            "room_id": room.id,
+            "sender_id": sender.id,
+            "receiver_id": receiver.id,
+            "message": content,
+            "type": message_type,
+            "timestamp": now,
+            "sending_datetime": now,
+            "is_sent": True,
+        }
+        await buffer.add(message)
+        return {
+            "uuid": message["uid"],
+            "is_sent": True,
+            "content": content,
+            "sender": str(sender.id),
+            "receiver": str(receiver.id),
+            "timestamp": now,
+            "type": message_type,
+        }
+
     @database_sync_to_async
     def create_message(self, room, sender, receiver, content, message_type):
         message = Message.objects.create(
@@ -151,11 +199,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             is_sent=True
         )
         return {
-            "uuid": str(message.uuid),
+            "uuid": str(message.uid),
             "is_sent": message.is_sent,
             "content": message.message,
-            "sender": str(message.sender.id),
-            "receiver": str(message.receiver.id),
+            "sender": str(message.sender_id),
+            "receiver": str(message.receiver_id),
             "timestamp": message.timestamp.isoformat(),
             "type": message.type,
         }
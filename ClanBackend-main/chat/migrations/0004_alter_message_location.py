@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 16:05
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_alter_message_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326, verbose_name='Location'),
+        ),
+    ]
@@ -2,6 +2,7 @@ import datetime
 from django.contrib.auth import get_user_model
 import uuid
 import os
+from django.utils import timezone
 from django.utils.deconstruct import deconstructible
 from django.contrib.gis.db import models
 from django.utils.translation import gettext_lazy as _
@@ -42,7 +43,8 @@ class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_messages", verbose_name=_("Sender"), db_index=True)
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="received_messages", verbose_name=_("Receiver"), db_index=True)
     message = models.TextField(_("Message"))
-    timestamp = models.DateTimeField(_("Timestamp"), auto_now_add=True)
+    # set on receipt rather than on insert, so that buffered messages keep their order
+    timestamp = models.DateTimeField(_("Timestamp"), default=timezone.now, editable=False)
     sending_datetime = models.DateTimeField(_("Sending Datetime"), blank=True, null=True)
     receiving_datetime = models.DateTimeField(_("Receiving Datetime"), blank=True, null=True)
     reading_datetime = models.DateTimeField(_("Reading Datetime"), blank=True, null=True)
@@ -53,7 +55,7 @@ class Message(models.Model):
     is_received = models.BooleanField(_("Is Received"), default=False)
     type = models.CharField(_("Type"), choices=Types.choices, default=Types.TEXT, max_length=20)
     file = models.FileField(_("File"), upload_to=PathAndRename())
-    location = models.PointField(_("Location"))
+    location = models.PointField(_("Location"), blank=True, null=True)
     sender_location = models.PointField(_("Sender Location"), blank=True, null=True)
     receiver_location = models.PointField(_("Receiver Location"), blank=True, null=True)
     old_content = models.JSONField(_("Old Content"), blank=True, null=True)
@@ -1,22 +1,30 @@
 from celery import shared_task
-from .models import Room, Message
-from django.contrib.auth import get_user_model
-from django.utils import timezone
+from .models import Message
+from django.utils.dateparse import parse_datetime
 
-User = get_user_model()
 
-@shared_task
-def create_message_task(room_id, sender_id, receiver_id, content, message_type):
-    room = Room.objects.get(id=room_id)
-    sender = User.objects.get(id=sender_id)
-    receiver = User.objects.get(id=receiver_id)
-    message = Message.objects.create(
-        room=room,
-        sender=sender,
-        receiver=receiver,
-        message=content,
-        type=message_type,
-        sending_datetime=timezone.now(),
-        is_sent=True
-    )
-    return message
+def save_messages(messages):
+    """
+    Inserts the messages of the write-behind buffer with one bulk_create,
+    in the order they were sent. Messages already saved are skipped by uid,
+    so a batch can be retried.
+    """
+    return Message.objects.bulk_create([
+        Message(**{
+            **message,
+            'timestamp': parse_datetime(message['timestamp']),
+            'sending_datetime': parse_datetime(message['sending_datetime']),
+        })
+        for message in messages
+    ], ignore_conflicts=True)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True)
+def save_pending_messages_task():
+    """
+    Saves the messages pending in the write-behind buffer, see chat.buffer.
+    Also meant to be scheduled with Celery beat, for the messages left
+    behind by a failed drain.
+    """
+    from .buffer import drain
+    return drain()
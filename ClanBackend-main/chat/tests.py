@@ -1,3 +1,81 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+import redis
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import buffer
+from .models import Message, Room
+from .tasks import save_messages
+
+User = get_user_model()
+
+
+def redis_available():
+    try:
+        return redis.from_url(buffer.get_url()).ping()
+    except redis.ConnectionError:
+        return False
+
+
+class WriteBehindTestCase(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user(username='sender', email='sender@example.com', password='sender')
+        self.receiver = User.objects.create_user(username='receiver', email='receiver@example.com', password='receiver')
+        self.room = Room.objects.create()
+        self.room.members.add(self.sender, self.receiver)
+
+    def buffered(self, content, timestamp):
+        # the shape ChatConsumer.buffer_message hands to the buffer
+        return {
+            "uid": str(uuid.uuid4()),
+            "room_id": self.room.id,
+            "sender_id": self.sender.id,
+            "receiver_id": self.receiver.id,
+            "message": content,
+            "type": Message.Types.TEXT,
+            "timestamp": timestamp.isoformat(),
+            "sending_datetime": timestamp.isoformat(),
+            "is_sent": True,
+        }
+
+    def test_save_messages(self):
+        now = timezone.now()
+        messages = [self.buffered('second', now), self.buffered('first', now - timedelta(seconds=1))]
+        save_messages(messages)
+        # a retried batch is skipped by uid
+        save_messages(messages)
+        self.assertQuerySetEqual(self.room.messages.all(), ['first', 'second'], lambda m: m.message)
+        first = self.room.messages.get(message='first')
+        self.assertEqual(str(first.uid), messages[1]['uid'])
+        self.assertEqual(first.timestamp, now - timedelta(seconds=1))
+
+    @skipUnless(redis_available(), 'requires Redis')
+    @override_settings(CHAT_WRITE_BEHIND_BATCH_SIZE=2)
+    def test_drain(self):
+        client = redis.from_url(buffer.get_url())
+        client.delete(buffer.PENDING_KEY, buffer.LOCK_KEY)
+        self.addCleanup(client.delete, buffer.PENDING_KEY, buffer.LOCK_KEY)
+        now = timezone.now()
+        with patch('chat.tasks.save_pending_messages_task.apply_async') as apply_async, \
+                patch('chat.tasks.save_pending_messages_task.delay') as delay:
+            for i in range(3):
+                async_to_sync(buffer.add)(self.buffered('message %d' % i, now + timedelta(seconds=i)))
+        # the first message schedules a drain, a full batch another one
+        apply_async.assert_called_once_with(countdown=buffer.get_interval())
+        delay.assert_called_once_with()
+        self.assertEqual(self.room.messages.count(), 0)
+
+        # another worker is draining
+        client.set(buffer.LOCK_KEY, 1)
+        self.assertEqual(buffer.drain(client), 0)
+        client.delete(buffer.LOCK_KEY)
+        self.assertEqual(buffer.drain(client), 3)
+        self.assertQuerySetEqual(self.room.messages.all(), ['message 0', 'message 1', 'message 2'], lambda m: m.message)
+        self.assertEqual(client.llen(buffer.PENDING_KEY), 0)
@@ -7,5 +7,6 @@ from .database import *
 from .files import *
 from .rest_framework import *
 from .localization import *
+from .activity import *
 
 
@@ -1 +1,5 @@
-ACTIVITY_SETTINGS = {}
\ No newline at end of file
+from .database import REPLICA_DATABASES
+
+ACTIVITY_SETTINGS = {
+    'REPLICAS': REPLICA_DATABASES,
+}
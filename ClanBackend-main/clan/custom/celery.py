@@ -1,4 +1,29 @@
 import os
 
+from celery.schedules import crontab
+
 CELERY_BROKER_URL = os.environ.get('REDIS_URL_CELERY_BROKER',"redis://localhost:6379/1")
-CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL_CELERY_RESULT',"redis://localhost:6379/1")
\ No newline at end of file
+CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL_CELERY_RESULT',"redis://localhost:6379/1")
+
+CELERY_BEAT_SCHEDULE = {
+    'maintain-activity-partitions': {
+        'task': 'activity.tasks.maintain_partitions_task',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'archive-notifications': {
+        'task': 'notifications.tasks.archive_notifications_task',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'reconcile-unread-notification-counts': {
+        'task': 'notifications.tasks.reconcile_unread_counts_task',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'save-pending-chat-messages': {
+        'task': 'chat.tasks.save_pending_messages_task',
+        'schedule': 60,
+    },
+    'send-notification-digests': {
+        'task': 'notifications.tasks.send_digests_task',
+        'schedule': crontab(minute=0),
+    },
+}
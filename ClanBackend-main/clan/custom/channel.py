@@ -9,3 +9,9 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# broadcast chat messages before saving them, in batches, see chat.buffer
+CHAT_WRITE_BEHIND = os.environ.get("CHAT_WRITE_BEHIND", "false").lower() in ("1", "true")
+CHAT_WRITE_BEHIND_INTERVAL = float(os.environ.get("CHAT_WRITE_BEHIND_INTERVAL", 0.05))
+CHAT_WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("CHAT_WRITE_BEHIND_BATCH_SIZE", 100))
+CHAT_WRITE_BEHIND_REDIS_URL = os.environ.get("REDIS_URL_CHAT", "redis://localhost:6379/5")
@@ -10,3 +10,18 @@ DATABASES = {
     }
 }
 
+# Read replicas of the activity streams, eg POSTGRES_REPLICA_HOSTS=replica1:5432,replica2
+# Under test they mirror the default database, so the routing runs without real replicas
+REPLICA_DATABASES = []
+for index, host in enumerate(filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(","))):
+    alias = f'replica_{index}'
+    host, _, port = host.strip().partition(':')
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port or DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['activity.routers.ReplicaRouter']
@@ -0,0 +1,107 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+ORDERING = ('-timestamp', '-id')
+
+
+def encode(obj):
+    """
+    Returns an opaque cursor pointing at the given object.
+    """
+    position = '{}|{}'.format(obj.timestamp.isoformat(), obj.pk)
+    return urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode(cursor):
+    """
+    Returns the ``(timestamp, id)`` position of a cursor.
+    Accepts either an encoded cursor or an instance with a timestamp.
+    Raises ValueError for malformed cursors.
+    """
+    if hasattr(cursor, 'timestamp'):
+        return cursor.timestamp, cursor.pk
+    try:
+        position = urlsafe_b64decode(cursor.encode() + b'=' * (-len(cursor) % 4))
+        timestamp, pk = position.decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, UnicodeError, ValueError):
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+
+
+def after(position):
+    """
+    Returns the condition of the rows newer than a position, a
+    ``(timestamp, id)`` pair or a ``(timestamp, None)`` one.
+    """
+    timestamp, pk = position
+    if pk is None:
+        return Q(timestamp__gt=timestamp)
+    return Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+
+
+def before(position, inclusive=False):
+    """
+    Returns the condition of the rows older than a position, a
+    ``(timestamp, id)`` pair or a ``(timestamp, None)`` one.
+    """
+    timestamp, pk = position
+    if pk is None:
+        return Q(timestamp__lte=timestamp) if inclusive else Q(timestamp__lt=timestamp)
+    return Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, **{'pk__lte' if inclusive else 'pk__lt': pk})
+
+
+def keyset(queryset, cursor=None):
+    """
+    Orders the queryset by ``(timestamp, id)`` descending and, if a cursor
+    is given, restricts it to the rows following the cursor position.
+    """
+    queryset = queryset.order_by(*ORDERING)
+    if not cursor:
+        return queryset
+    return queryset.filter(before(decode(cursor)))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on ``(timestamp, id)``, newest first.
+    Pages are fetched with an indexed range condition instead of an OFFSET
+    and no COUNT query is issued.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE or 25
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            queryset = keyset(queryset, request.query_params.get(self.cursor_query_param))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode(self.page[-1]))
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+from itertools import islice
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ImproperlyConfigured
@@ -12,7 +14,7 @@ from django.utils.html import format_html
 
 from jsonfield.fields import JSONField
 from model_utils import Choices
-from notifications import settings as notifications_settings
+from notifications import counters, push, settings as notifications_settings
 from notifications.signals import notify
 from notifications.utils import id2slug
 from swapper import load_model
@@ -35,6 +37,11 @@ def assert_soft_delete():
         raise ImproperlyConfigured(msg)
 
 
+# the condition of the partial index of the notifications NotificationQuerySet.unread
+# returns; fixed, so that it does not depend on SOFT_DELETE, which only narrows it
+LIVE = models.Q(unread=True)
+
+
 class NotificationQuerySet(models.query.QuerySet):
     ''' Notification QuerySet '''
     def unsent(self):
@@ -72,6 +79,7 @@ class NotificationQuerySet(models.query.QuerySet):
         if recipient:
             qset = qset.filter(recipient=recipient)
 
+        counters.adjust_queryset(qset.unread(), -1)
         return qset.update(unread=False)
 
     def mark_all_as_unread(self, recipient=None):
@@ -84,6 +92,7 @@ class NotificationQuerySet(models.query.QuerySet):
         if recipient:
             qset = qset.filter(recipient=recipient)
 
+        counters.adjust_queryset(qset.read(), 1)
         return qset.update(unread=True)
 
     def deleted(self):
@@ -105,6 +114,7 @@ class NotificationQuerySet(models.query.QuerySet):
         if recipient:
             qset = qset.filter(recipient=recipient)
 
+        counters.adjust_queryset(qset.filter(unread=True), -1)
         return qset.update(deleted=True)
 
     def mark_all_as_active(self, recipient=None):
@@ -116,6 +126,7 @@ class NotificationQuerySet(models.query.QuerySet):
         if recipient:
             qset = qset.filter(recipient=recipient)
 
+        counters.adjust_queryset(qset.filter(unread=True), 1)
         return qset.update(deleted=False)
 
     def mark_as_unsent(self, recipient=None):
@@ -222,8 +233,12 @@ class AbstractNotification(models.Model):
     class Meta:
         abstract = True
         ordering = ('-timestamp',)
-        # speed up notifications count query
-        index_together = ('recipient', 'unread')
+        indexes = [
+            # speed up notifications count query
+            models.Index(fields=['recipient', 'unread'], name='%(class)s_unread_idx'),
+            # the live endpoints, only the notifications NotificationQuerySet.unread returns
+            models.Index(fields=['recipient', '-timestamp'], condition=LIVE, name='%(class)s_live_idx'),
+        ]
         verbose_name = _('Notification')
         verbose_name_plural = _('Notifications')
 
@@ -259,11 +274,15 @@ class AbstractNotification(models.Model):
         if self.unread:
             self.unread = False
             self.save()
+            if not (is_soft_delete() and self.deleted):
+                counters.adjust({self.recipient_id: -1})
 
     def mark_as_unread(self):
         if not self.unread:
             self.unread = True
             self.save()
+            if not (is_soft_delete() and self.deleted):
+                counters.adjust({self.recipient_id: 1})
 
     def actor_object_url(self):
         try:
@@ -296,63 +315,92 @@ class AbstractNotification(models.Model):
 def notify_handler(verb, **kwargs):
     """
     Handler function to create Notification instance upon action signal call.
+
+    A single recipient gets its notification saved as usual. For groups,
+    querysets and lists the content types are resolved once, queryset
+    recipients are streamed with ``.iterator()`` and the notifications are
+    inserted with ``bulk_create``, ``NOTIFICATIONS_CONFIG['BATCH_SIZE']`` at a time.
+
+    With ``async_fanout=True`` (defaults to ``NOTIFICATIONS_CONFIG['ASYNC_FANOUT']``)
+    group recipients, and queryset recipients filtered only by lookups on
+    values of their fields, are notified by Celery workers instead, see
+    ``notifications.tasks.fan_out``, and the id of the fan-out is returned.
     """
     # Pull the options out of kwargs
     kwargs.pop('signal', None)
     recipient = kwargs.pop('recipient')
+    async_fanout = kwargs.pop('async_fanout', notifications_settings.get_config()['ASYNC_FANOUT'])
     actor = kwargs.pop('sender')
     optional_objs = [
-        (kwargs.pop(opt, None), opt)
+        (kwargs.pop(opt, None), opt, kwargs.pop(f'{opt}_for_concrete_model', True))
         for opt in ('target', 'action_object')
     ]
-    public = bool(kwargs.pop('public', True))
-    description = kwargs.pop('description', None)
-    timestamp = kwargs.pop('timestamp', timezone.now())
     Notification = load_model('notifications', 'Notification')
-    level = kwargs.pop('level', Notification.LEVELS.info)
     actor_for_concrete_model = kwargs.pop('actor_for_concrete_model', True)
+    fields = {
+        'actor_content_type': ContentType.objects.get_for_model(actor, for_concrete_model=actor_for_concrete_model),
+        'actor_object_id': actor.pk,
+        'verb': str(verb),
+        'public': bool(kwargs.pop('public', True)),
+        'description': kwargs.pop('description', None),
+        'timestamp': kwargs.pop('timestamp', timezone.now()),
+        'level': kwargs.pop('level', Notification.LEVELS.info),
+    }
+
+    # Set optional objects
+    for obj, opt, for_concrete_model in optional_objs:
+        if obj is not None:
+            fields['%s_object_id' % opt] = obj.pk
+            fields['%s_content_type' % opt] = ContentType.objects.get_for_model(
+                obj, for_concrete_model=for_concrete_model)
+
+    if kwargs and EXTRA_DATA:
+        # set kwargs as model column if available
+        for key in list(kwargs.keys()):
+            if hasattr(Notification, key):
+                fields[key] = kwargs.pop(key)
+        fields['data'] = kwargs
+
+    if async_fanout and isinstance(recipient, (Group, QuerySet)):
+        from notifications.tasks import describe, fan_out
+        if isinstance(recipient, Group):
+            model, q = get_user_model(), models.Q(groups=recipient.pk)
+        else:
+            model, q = recipient.model, describe(recipient)
+        if q is not None:
+            return fan_out(model, q, fields)
 
     # Check if User or Group
     if isinstance(recipient, Group):
-        recipients = recipient.user_set.all()
-    elif isinstance(recipient, (QuerySet, list)):
-        recipients = recipient
-    else:
-        recipients = [recipient]
-
-    new_notifications = []
-
-    for recipient in recipients:
-        newnotify = Notification(
-            recipient=recipient,
-            actor_content_type=ContentType.objects.get_for_model(actor, for_concrete_model=actor_for_concrete_model),
-            actor_object_id=actor.pk,
-            verb=str(verb),
-            public=public,
-            description=description,
-            timestamp=timestamp,
-            level=level,
-        )
-
-        # Set optional objects
-        for obj, opt in optional_objs:
-            if obj is not None:
-                for_concrete_model = kwargs.pop(f'{opt}_for_concrete_model', True)
-                setattr(newnotify, '%s_object_id' % opt, obj.pk)
-                setattr(newnotify, '%s_content_type' % opt,
-                        ContentType.objects.get_for_model(obj, for_concrete_model=for_concrete_model))
-
-        if kwargs and EXTRA_DATA:
-            # set kwargs as model column if available
-            for key in list(kwargs.keys()):
-                if hasattr(newnotify, key):
-                    setattr(newnotify, key, kwargs.pop(key))
-            newnotify.data = kwargs
-
-        newnotify.save()
-        new_notifications.append(newnotify)
-
-    return new_notifications
+        recipient = recipient.user_set.all()
+    if isinstance(recipient, QuerySet):
+        batch_size = notifications_settings.get_config()['BATCH_SIZE']
+        recipients = recipient.values_list('pk', flat=True).iterator(chunk_size=batch_size)
+        return bulk_notify((Notification(recipient_id=pk, **fields) for pk in recipients), batch_size)
+    if isinstance(recipient, list):
+        return bulk_notify(Notification(recipient=user, **fields) for user in recipient)
+
+    newnotify = Notification(recipient=recipient, **fields)
+    newnotify.save()
+    counters.adjust({newnotify.recipient_id: 1})
+    push.push([newnotify])
+    return [newnotify]
+
+
+def bulk_notify(notifications, batch_size=None):
+    """
+    Inserts the notifications with ``bulk_create``, ``batch_size`` at a time
+    (defaults to ``NOTIFICATIONS_CONFIG['BATCH_SIZE']``), and returns them.
+    """
+    if batch_size is None:
+        batch_size = notifications_settings.get_config()['BATCH_SIZE']
+    Notification = load_model('notifications', 'Notification')
+    notifications, created = iter(notifications), []
+    for batch in iter(lambda: list(islice(notifications, batch_size)), []):
+        created.extend(Notification.objects.bulk_create(batch))
+        counters.invalidate({notification.recipient_id for notification in batch})
+        push.push(batch)
+    return created
 
 
 # connect the signal
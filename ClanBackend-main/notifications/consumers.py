@@ -0,0 +1,45 @@
+''' Django notifications consumers file '''
+# -*- coding: utf-8 -*-
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.core.serializers.json import DjangoJSONEncoder
+
+from notifications import counters, push
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes the notifications of the connected user, see ``notifications.push``.
+    Sends the unread count on connection, then ``notification`` events with
+    new notifications and ``changed`` events after bursts.
+    """
+
+    async def connect(self):
+        if self.scope["user"].is_anonymous:
+            await self.close()
+            return
+        self.user = self.scope["user"]
+        self.group_name = push.group_name(self.user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await database_sync_to_async(push.connected)(self.user.pk, 1)
+        await self.accept()
+        await self.send_json({
+            'type': 'unread_count',
+            'unread_count': await database_sync_to_async(counters.get_unread_count)(self.user),
+        })
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await database_sync_to_async(push.connected)(self.user.pk, -1)
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_new(self, event):
+        await self.send_json({'type': 'notification', 'notification': event['notification']})
+
+    async def notification_changed(self, event):
+        await self.send_json({'type': 'changed', 'count': event['count']})
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content, cls=DjangoJSONEncoder))
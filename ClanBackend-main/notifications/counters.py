@@ -0,0 +1,98 @@
+''' Django notifications unread counters file '''
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from swapper import load_model
+
+from notifications.settings import get_config
+
+
+def unread_key(user_id):
+    return 'notifications:unread:{}'.format(user_id)
+
+
+def count_unread(user_ids):
+    """
+    Returns the number of unread notifications of each user from the database.
+    """
+    Notification = load_model('notifications', 'Notification')
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(
+        Notification.objects.filter(recipient__in=user_ids).unread().order_by()
+        .values_list('recipient').annotate(count=Count('pk'))
+    )
+    return counts
+
+
+def get_unread_count(user):
+    """
+    Returns the number of unread notifications of the user, counted in the
+    database only when the cached counter is missing.
+    """
+    count = cache.get(unread_key(user.pk))
+    if count is None:
+        count = count_unread([user.pk])[user.pk]
+        cache.add(unread_key(user.pk), count, get_config()['CACHE_TIMEOUT'])
+    return max(count, 0)
+
+
+def adjust(deltas):
+    """
+    Adds ``{user id: delta}`` to the cached counters once the current
+    transaction commits, so a rollback leaves them alone. Counters that are
+    not cached are left alone, they are counted on the next read.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def incr():
+        for user_id, delta in deltas.items():
+            try:
+                cache.incr(unread_key(user_id), delta)
+            except ValueError:
+                pass
+    transaction.on_commit(incr)
+
+
+def adjust_queryset(queryset, sign):
+    """
+    Adds ``sign`` times the number of notifications of the queryset, per
+    recipient, to the counters. Called with the notifications about to
+    enter (1) or leave (-1) the unread ones.
+    """
+    adjust({
+        user_id: sign * count
+        for user_id, count in queryset.order_by().values_list('recipient').annotate(count=Count('pk'))
+    })
+
+
+def invalidate(user_ids):
+    """
+    Drops the cached counters of the users, eg after bulk inserts where
+    one round trip beats an increment per recipient. They are dropped again
+    once the current transaction commits: until then concurrent readers
+    still count, and may cache, the previous notifications.
+    """
+    keys = [unread_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def reconcile(user_ids):
+    """
+    Recounts the cached counters of the users from the database, fixing the
+    drift left by concurrent updates. Users without a cached counter are skipped.
+    Returns the number of counters fixed.
+    """
+    cached = cache.get_many([unread_key(user_id) for user_id in user_ids])
+    if not cached:
+        return 0
+    counts = count_unread([user_id for user_id in user_ids if unread_key(user_id) in cached])
+    stale = {
+        unread_key(user_id): count for user_id, count in counts.items()
+        if cached[unread_key(user_id)] != count
+    }
+    cache.set_many(stale, get_config()['CACHE_TIMEOUT'])
+    return len(stale)
@@ -0,0 +1,81 @@
+''' Django notifications digests file '''
+# -*- coding: utf-8 -*-
+from itertools import groupby
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
+from django.utils.translation import ngettext
+from swapper import load_model
+
+from notifications.settings import get_config
+
+
+def render_digest(recipient, notifications, count):
+    """
+    Returns the email of the digest of the ``count`` unsent notifications of a
+    recipient, listing the given latest ones, or None if the recipient has no
+    email address.
+    """
+    email = getattr(recipient, recipient.get_email_field_name(), None)
+    if not email:
+        return None
+    subject = ngettext('%(count)d new notification', '%(count)d new notifications', count) % {'count': count}
+    body = render_to_string('notifications/digest.txt', {
+        'recipient': recipient,
+        'notifications': notifications,
+        'count': count,
+        'more': count - len(notifications),
+    })
+    return EmailMessage(subject, body, to=[email])
+
+
+def send_digests(batch_size=None):
+    """
+    Emails each recipient of unread, unsent notifications one digest of them
+    and marks them as sent.
+
+    Recipients are paginated by id, ``batch_size`` at a time (defaults to
+    ``NOTIFICATIONS_CONFIG['DIGEST_BATCH_SIZE']``). For each batch the
+    notifications are counted per recipient and only the ``DIGEST_MAX_ITEMS``
+    latest ones of each are fetched, with their actors, targets and action
+    objects. The digests are sent over a single SMTP connection and the batch
+    is marked as sent in one update, so that a failure only resends the
+    failed batch. Returns the number of digests sent.
+    """
+    if batch_size is None:
+        batch_size = get_config()['DIGEST_BATCH_SIZE']
+    Notification = load_model('notifications', 'Notification')
+    unsent = Notification.objects.unsent().unread()
+    max_items = get_config()['DIGEST_MAX_ITEMS']
+    last_recipient, sent = None, 0
+    with get_connection() as connection:
+        while True:
+            recipients = unsent.order_by('recipient_id').values_list('recipient_id', flat=True).distinct()
+            if last_recipient is not None:
+                recipients = recipients.filter(recipient_id__gt=last_recipient)
+            recipients = list(recipients[:batch_size])
+            if not recipients:
+                return sent
+            last_recipient, last_pk = recipients[-1], None
+            batch = unsent.filter(recipient_id__in=recipients)
+            counts = {}
+            for recipient_id, count, last in batch.order_by().values_list('recipient_id').annotate(
+                    count=Count('pk'), last=Max('pk')):
+                counts[recipient_id] = count
+                last_pk = max(last, last_pk or last)
+            # notifications arriving meanwhile are left for the next digest
+            batch = batch.filter(pk__lte=last_pk)
+            notifications = (
+                batch.annotate(rank=Window(
+                    RowNumber(), partition_by=[F('recipient_id')], order_by=[F('timestamp').desc(), F('pk').desc()]
+                )).filter(rank__lte=max_items).order_by('recipient_id', '-timestamp', '-pk')
+                .select_related('recipient').prefetch_related('actor', 'target', 'action_object')
+            )
+            digests = []
+            for recipient_id, group in groupby(notifications, key=lambda n: n.recipient_id):
+                group = list(group)
+                digests.append(render_digest(group[0].recipient, group, counts[recipient_id]))
+            sent += connection.send_messages([digest for digest in digests if digest]) or 0
+            batch.mark_as_sent()
@@ -0,0 +1,81 @@
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from clan.pagination import KeysetPagination, after, before, decode, encode
+
+
+def parse_position(value):
+    """
+    Returns the ``(timestamp, id)`` position of a cursor, or ``(timestamp, None)``
+    for an ISO 8601 datetime. Raises ValueError otherwise.
+    """
+    try:
+        timestamp = parse_datetime(value)
+    except ValueError:
+        timestamp = None
+    if timestamp is not None:
+        return timestamp, None
+    return decode(value)
+
+
+class NotificationCursorPagination(KeysetPagination):
+    """
+    Keyset pagination for notifications on ``(timestamp, id)``, newest first.
+
+    ``since`` and ``until`` restrict the notifications to those newer than, and
+    up to, a cursor or an ISO 8601 datetime. ``latest`` is the cursor of the
+    newest notification of the first page, carried over to the next pages by
+    their links, to be passed as ``since`` on the next poll to only fetch the
+    notifications that arrived meanwhile. It is the ``since`` given when there
+    is none.
+    """
+    latest_query_param = 'latest'
+
+    def get_position(self, request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return parse_position(value)
+        except ValueError:
+            raise ValidationError({name: 'Expected a cursor or an ISO 8601 datetime.'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        since, until = self.get_position(request, 'since'), self.get_position(request, 'until')
+        if since:
+            queryset = queryset.filter(after(since))
+        if until:
+            queryset = queryset.filter(before(until, inclusive=True))
+        page = super().paginate_queryset(queryset, request, view)
+        if self.cursor_query_param in request.query_params:
+            self.latest = request.query_params.get(self.latest_query_param)
+        else:
+            self.latest = encode(page[0]) if page else None
+        self.latest = self.latest or request.query_params.get('since') or None
+        return page
+
+    def get_next_link(self):
+        url = super().get_next_link()
+        if url is None or not self.latest:
+            return url
+        return replace_query_param(url, self.latest_query_param, self.latest)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'latest': self.latest,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'latest': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
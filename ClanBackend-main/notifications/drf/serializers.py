@@ -0,0 +1,34 @@
+from rest_framework import serializers
+from swapper import load_model
+
+Notification = load_model('notifications', 'Notification')
+
+
+class GenericObjectField(serializers.Field):
+    """
+    Read only field with the model label, primary key and text of the object
+    of a generic relation
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        return {'type': obj._meta.label_lower, 'id': str(obj.pk), 'name': str(obj)}
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """
+    Compact serializer for notifications, the empty fields are left out
+    """
+    actor = GenericObjectField()
+    target = GenericObjectField()
+    action_object = GenericObjectField()
+    data = serializers.JSONField(read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = 'slug level verb description unread timestamp actor target action_object data'.split()
+
+    def to_representation(self, instance):
+        return {name: value for name, value in super().to_representation(instance).items() if value is not None}
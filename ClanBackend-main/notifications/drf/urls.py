@@ -0,0 +1,9 @@
+from rest_framework import routers
+
+from notifications.drf.views import NotificationViewSet
+
+
+router = routers.SimpleRouter()
+router.register(r'notifications', NotificationViewSet, basename='notification')
+
+urlpatterns = router.urls
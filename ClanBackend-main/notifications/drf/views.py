@@ -0,0 +1,28 @@
+from rest_framework import mixins, permissions, viewsets
+
+from notifications.drf.pagination import NotificationCursorPagination
+from notifications.drf.serializers import NotificationSerializer
+from notifications.settings import get_config
+
+
+class NotificationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Notifications of the current user, newest first, paginated on
+    ``(timestamp, id)``. ``?unread=true`` only returns the unread ones, see
+    ``NotificationCursorPagination`` for ``since``/``until``.
+    """
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
+    permission_classes = [permissions.IsAuthenticated]
+    # the ordering is the pagination's
+    filter_backends = []
+
+    def get_queryset(self):
+        notifications = self.request.user.notifications
+        if self.request.query_params.get('unread') in ('true', '1'):
+            queryset = notifications.unread()
+        elif get_config()['SOFT_DELETE']:
+            queryset = notifications.active()
+        else:
+            queryset = notifications.all()
+        return queryset.prefetch_related('actor', 'target', 'action_object')
@@ -1,7 +1,12 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
 from django.forms import model_to_dict
 from notifications.utils import id2slug
 from notifications.settings import get_config
 
+GENERIC_FIELDS = ('actor', 'target', 'action_object')
+
 def get_object_url(instance, notification, request):
     """
     Get url representing the instance object.
@@ -27,33 +32,85 @@ def get_num_to_fetch(request):
         num_to_fetch = default_num_to_fetch
     return num_to_fetch
 
+def notification_to_dict(notification, request=None):
+    """
+    Returns the dictionary of a notification used by the live endpoints and pushes.
+    """
+    struct = model_to_dict(notification)
+    struct['slug'] = id2slug(notification.id)
+    if notification.actor:
+        struct['actor'] = str(notification.actor)
+        actor_url = get_object_url(
+            notification.actor, notification, request)
+        if actor_url:
+            struct['actor_url'] = actor_url
+    if notification.target:
+        struct['target'] = str(notification.target)
+        target_url = get_object_url(
+            notification.target, notification, request)
+        if target_url:
+            struct['target_url'] = target_url
+    if notification.action_object:
+        struct['action_object'] = str(notification.action_object)
+        action_object_url = get_object_url(
+            notification.action_object, notification, request)
+        if action_object_url:
+            struct['action_object_url'] = action_object_url
+    if notification.data:
+        struct['data'] = notification.data
+    return struct
+
+def fetch_generic_objects(rows, names=GENERIC_FIELDS):
+    """
+    Returns the objects of the generic relations ``names`` of the ``.values()``
+    rows, keyed by ``(content type id, object id)``, with one query per content type.
+    """
+    ids = defaultdict(set)
+    for row in rows:
+        for name in names:
+            content_type_id = row['%s_content_type_id' % name]
+            if content_type_id is not None:
+                ids[content_type_id].add(row['%s_object_id' % name])
+    objects = {}
+    for content_type_id, object_ids in ids.items():
+        model_class = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model_class is None:
+            continue
+        for obj in model_class._base_manager.filter(pk__in=object_ids):
+            objects[(content_type_id, str(obj.pk))] = obj
+    return objects
+
 def get_notification_list(request, method_name='all'):
+    """
+    Returns the latest notifications of the user as dictionaries, in the shape
+    of ``notification_to_dict``. The page is read as a ``.values()`` projection,
+    its generic relations fetched with one query per content type, and with
+    ``mark_as_read`` in the query string it is marked as read in one update.
+    """
     num_to_fetch = get_num_to_fetch(request)
+    queryset = getattr(request.user.notifications, method_name)()
+    Notification = queryset.model
+    fields = [field for field in Notification._meta.concrete_fields if field.editable]
+    rows = list(queryset[0:num_to_fetch].values(*[field.attname for field in fields]))
+    objects = fetch_generic_objects(rows)
     notification_list = []
-    for notification in getattr(request.user.notifications, method_name)()[0:num_to_fetch]:
-        struct = model_to_dict(notification)
-        struct['slug'] = id2slug(notification.id)
-        if notification.actor:
-            struct['actor'] = str(notification.actor)
-            actor_url = get_object_url(
-                notification.actor, notification, request)
-            if actor_url:
-                struct['actor_url'] = actor_url
-        if notification.target:
-            struct['target'] = str(notification.target)
-            target_url = get_object_url(
-                notification.target, notification, request)
-            if target_url:
-                struct['target_url'] = target_url
-        if notification.action_object:
-            struct['action_object'] = str(notification.action_object)
-            action_object_url = get_object_url(
-                notification.action_object, notification, request)
-            if action_object_url:
-                struct['action_object_url'] = action_object_url
-        if notification.data:
-            struct['data'] = notification.data
+    for row in rows:
+        struct = {field.name: row[field.attname] for field in fields}
+        struct['slug'] = id2slug(row['id'])
+        notification = None
+        for name in GENERIC_FIELDS:
+            obj = objects.get((row['%s_content_type_id' % name], row['%s_object_id' % name]))
+            if obj:
+                if notification is None:
+                    # unsaved, only handed to get_url_for_notifications
+                    notification = Notification(**row)
+                struct[name] = str(obj)
+                url = get_object_url(obj, notification, request)
+                if url:
+                    struct['%s_url' % name] = url
+        if row['data']:
+            struct['data'] = row['data']
         notification_list.append(struct)
-        if request.GET.get('mark_as_read'):
-            notification.mark_as_read()
+    if request.GET.get('mark_as_read'):
+        Notification.objects.filter(pk__in=[row['id'] for row in rows]).mark_all_as_read()
     return notification_list
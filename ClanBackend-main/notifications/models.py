@@ -1,3 +1,7 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import gettext_lazy as _
 from swapper import swappable_setting
 
 from .base.models import AbstractNotification, notify_handler  # noqa
@@ -20,4 +24,30 @@ class Notification(AbstractNotification):
 
     def naturaltime(self):
         from django.contrib.humanize.templatetags.humanize import naturaltime
-        return naturaltime(self.timestamp)     
\ No newline at end of file
+        return naturaltime(self.timestamp)
+
+
+class ArchivedNotification(AbstractNotification):
+    """
+    Read and deleted notifications moved out of the notifications table by
+    ``notifications.retention.archive``, with their ids kept.
+    """
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_notifications',
+        verbose_name=_('recipient'),
+    )
+    actor_content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name='+', verbose_name=_('actor content type'))
+    target_content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name='+', verbose_name=_('target content type'),
+        blank=True, null=True)
+    action_object_content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name='+', verbose_name=_('action object content type'),
+        blank=True, null=True)
+
+    class Meta:
+        ordering = ('-timestamp',)
+        verbose_name = _('Archived notification')
+        verbose_name_plural = _('Archived notifications')
@@ -0,0 +1,129 @@
+''' Django notifications websocket push file '''
+# -*- coding: utf-8 -*-
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+from notifications.helpers import notification_to_dict
+from notifications.settings import get_config
+
+
+def group_name(user_id):
+    return 'notifications_{}'.format(user_id)
+
+
+def online_key(user_id):
+    return 'notifications:online:{}'.format(user_id)
+
+
+def coalesce_key(user_id):
+    return 'notifications:pushed:{}'.format(user_id)
+
+
+def pending_key(user_id):
+    return 'notifications:pending:{}'.format(user_id)
+
+
+def connected(user_id, delta):
+    """
+    Counts the open sockets of the user, so pushes skip the users who are offline.
+    """
+    if cache.add(online_key(user_id), max(delta, 0), get_config()['PUSH_ONLINE_TIMEOUT']):
+        return
+    try:
+        cache.incr(online_key(user_id), delta)
+    except ValueError:
+        pass
+
+
+def online(user_ids):
+    """
+    Returns the ids of the users with an open socket.
+    """
+    counts = cache.get_many([online_key(user_id) for user_id in user_ids])
+    return [user_id for user_id in user_ids if counts.get(online_key(user_id), 0) > 0]
+
+
+def push(notifications):
+    """
+    Pushes new notifications to the sockets of their recipients once the
+    current transaction commits.
+
+    A single notification is sent in full (``notification.new``). Larger
+    batches, eg a fan-out to a whole group, only send each online recipient
+    a ``notification.changed`` event with the number of new notifications:
+    the client refreshes its list and count on it. The first batch opens a
+    window of ``NOTIFICATIONS_CONFIG['PUSH_COALESCE_SECONDS']`` during which
+    the following batches are only counted, and announced by a single
+    trailing event when the window ends, see ``flush``. Bursts then cost a
+    couple of messages per connected user instead of one per notification.
+    """
+    if not notifications or get_channel_layer() is None:
+        return
+    transaction.on_commit(lambda: send(notifications))
+
+
+def send(notifications):
+    channel_layer = get_channel_layer()
+    if len(notifications) == 1:
+        notification, = notifications
+        if online([notification.recipient_id]):
+            async_to_sync(channel_layer.group_send)(group_name(notification.recipient_id), {
+                'type': 'notification.new',
+                'notification': notification_to_dict(notification),
+            })
+        return
+
+    counts = {}
+    for notification in notifications:
+        counts[notification.recipient_id] = counts.get(notification.recipient_id, 0) + 1
+    timeout = get_config()['PUSH_COALESCE_SECONDS']
+    opened = []
+    for user_id in online(list(counts)):
+        # the window is closed by flush, the timeout only covers a lost flush
+        if cache.add(coalesce_key(user_id), True, 2 * timeout):
+            send_changed(channel_layer, user_id, counts[user_id])
+            opened.append(user_id)
+        elif not cache.add(pending_key(user_id), counts[user_id], 2 * timeout):
+            try:
+                cache.incr(pending_key(user_id), counts[user_id])
+            except ValueError:
+                pass
+    if opened:
+        schedule_flush(opened)
+
+
+def send_changed(channel_layer, user_id, count):
+    async_to_sync(channel_layer.group_send)(group_name(user_id), {
+        'type': 'notification.changed',
+        'count': count,
+    })
+
+
+def schedule_flush(user_ids):
+    from notifications.tasks import flush_pushes_task
+    flush_pushes_task.apply_async((user_ids,), countdown=get_config()['PUSH_COALESCE_SECONDS'])
+
+
+def flush(user_ids):
+    """
+    Ends the coalescing windows of the users: those who got notifications
+    during the window are sent a trailing ``notification.changed`` event with
+    their number and a new window is opened, the windows of the others are closed.
+    """
+    channel_layer = get_channel_layer()
+    timeout = get_config()['PUSH_COALESCE_SECONDS']
+    pending = cache.get_many([pending_key(user_id) for user_id in user_ids])
+    reopened = []
+    for user_id in user_ids:
+        count = pending.get(pending_key(user_id), 0)
+        if count > 0:
+            cache.decr(pending_key(user_id), count)
+            cache.set(coalesce_key(user_id), True, 2 * timeout)
+            send_changed(channel_layer, user_id, count)
+            reopened.append(user_id)
+        else:
+            cache.delete(coalesce_key(user_id))
+    if reopened:
+        schedule_flush(reopened)
@@ -0,0 +1,61 @@
+''' Django notifications retention file '''
+# -*- coding: utf-8 -*-
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+from swapper import load_model
+
+from notifications.settings import get_config
+
+
+def archivable(before):
+    """
+    Returns the notifications older than ``before`` that the live endpoints
+    no longer show: the read ones and, with ``SOFT_DELETE``, the deleted ones.
+    """
+    Notification = load_model('notifications', 'Notification')
+    queryset = Notification.objects.filter(timestamp__lt=before)
+    if get_config()['SOFT_DELETE']:
+        return queryset.filter(Q(unread=False) | Q(deleted=True))
+    return queryset.filter(unread=False)
+
+
+def archive(before, batch_size=None):
+    """
+    Moves the archivable notifications older than ``before`` to the
+    ``ArchivedNotification`` table, ``batch_size`` at a time (defaults to
+    ``NOTIFICATIONS_CONFIG['BATCH_SIZE']``), each batch in its own transaction.
+    Returns the number of notifications archived.
+    """
+    if batch_size is None:
+        batch_size = get_config()['BATCH_SIZE']
+    ArchivedNotification = apps.get_model('notifications', 'ArchivedNotification')
+    fields = [field.attname for field in ArchivedNotification._meta.concrete_fields]
+    archived = 0
+    while True:
+        with transaction.atomic():
+            # locked, so that a notification marked as unread meanwhile is not archived
+            rows = list(archivable(before).order_by('pk').select_for_update().values(*fields)[:batch_size])
+            if not rows:
+                return archived
+            # a conflict rolls the batch back rather than deleting a notification that was not archived
+            ArchivedNotification.objects.bulk_create([ArchivedNotification(**row) for row in rows])
+            archivable(before).filter(pk__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+
+
+def purge(before, batch_size=None):
+    """
+    Deletes the archived notifications older than ``before``, ``batch_size``
+    at a time. Returns the number of notifications deleted.
+    """
+    if batch_size is None:
+        batch_size = get_config()['BATCH_SIZE']
+    ArchivedNotification = apps.get_model('notifications', 'ArchivedNotification')
+    queryset = ArchivedNotification.objects.filter(timestamp__lt=before)
+    purged = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += ArchivedNotification.objects.filter(pk__in=ids).delete()[0]
@@ -8,7 +8,16 @@ CONFIG_DEFAULTS = {
     'USE_JSONFIELD': False,
     'SOFT_DELETE': False,
     'NUM_TO_FETCH': 10,
-    'CACHE_TIMEOUT': 2,
+    'CACHE_TIMEOUT': 60 * 60,
+    'BATCH_SIZE': 1000,
+    'ASYNC_FANOUT': False,
+    'FANOUT_SHARD_SIZE': 10000,
+    'PUSH_COALESCE_SECONDS': 5,
+    'PUSH_ONLINE_TIMEOUT': 24 * 60 * 60,
+    'ARCHIVE_AFTER_DAYS': 90,
+    'PURGE_AFTER_DAYS': None,
+    'DIGEST_BATCH_SIZE': 100,
+    'DIGEST_MAX_ITEMS': 20,
 }
 
 
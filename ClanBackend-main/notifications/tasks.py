@@ -0,0 +1,210 @@
+''' Django notifications tasks file '''
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from itertools import islice
+from uuid import uuid4
+
+from celery import group, shared_task
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Lookup, Max, Min, Q
+from django.db.models.expressions import Col
+from django.db.models.sql.where import WhereNode
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from swapper import load_model
+
+from notifications import counters, digests, push, retention
+from notifications.base.models import bulk_notify
+from notifications.settings import get_config
+
+# how long the progress of a fan-out is kept, in seconds
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+def progress_key(fanout_id, name):
+    return 'notifications:fanout:{}:{}'.format(fanout_id, name)
+
+
+def serialize_fields(fields):
+    """
+    Makes the field values shared by the notifications of a fan-out JSON serializable.
+    """
+    serialized = {}
+    for name, value in fields.items():
+        if isinstance(value, ContentType):
+            serialized['%s_id' % name] = value.pk
+        elif name == 'timestamp':
+            serialized[name] = value.isoformat()
+        else:
+            serialized[name] = value
+    return serialized
+
+
+def deserialize_fields(fields):
+    return {**fields, 'timestamp': parse_datetime(fields['timestamp'])}
+
+
+def describe(queryset):
+    """
+    Returns the filter of the queryset as a Q made of lookups on values of its
+    model's fields, or None if it filters on anything else (joins, expressions,
+    subqueries...) or is sliced or combined.
+    """
+    query = queryset.query
+
+    def to_q(node):
+        if isinstance(node, WhereNode):
+            children = [to_q(child) for child in node.children]
+            if None in children:
+                return None
+            return Q(*children, _connector=node.connector, _negated=node.negated)
+        if (isinstance(node, Lookup) and isinstance(node.lhs, Col) and node.lhs.alias == query.base_table
+                and is_value(node.rhs)):
+            return Q(**{'%s__%s' % (node.lhs.target.name, node.lookup_name): node.rhs})
+        return None
+
+    if query.is_sliced or query.combinator or query.extra:
+        return None
+    return to_q(query.where)
+
+
+def is_value(value):
+    if isinstance(value, (list, tuple)):
+        return all(map(is_value, value))
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def serialize_q(q):
+    return {
+        'connector': q.connector,
+        'negated': q.negated,
+        'children': [serialize_q(child) if isinstance(child, Q) else list(child) for child in q.children],
+    }
+
+
+def deserialize_q(data):
+    return Q(*(deserialize_q(child) if isinstance(child, dict) else tuple(child) for child in data['children']),
+             _connector=data['connector'], _negated=data['negated'])
+
+
+def fan_out(model, q, fields, shard_size=None):
+    """
+    Notifies the instances of ``model`` matching ``q`` on Celery workers.
+
+    The recipients are described by the label of the model, the filter and
+    the range of their primary keys, read with a single aggregate query. The
+    range is split in slices of ``shard_size`` primary keys (defaults to
+    ``NOTIFICATIONS_CONFIG['FANOUT_SHARD_SIZE']``), each streamed and inserted
+    in parallel by a ``fan_out_shard`` task once the current transaction
+    commits. Returns the id of the fan-out, see ``get_progress``.
+    """
+    if shard_size is None:
+        shard_size = get_config()['FANOUT_SHARD_SIZE']
+    fanout_id = uuid4().hex
+    bounds = model._default_manager.filter(q).aggregate(first=Min('pk'), last=Max('pk'))
+    shards = []
+    if bounds['first'] is not None:
+        shards = [(pk, min(pk + shard_size - 1, bounds['last']))
+                  for pk in range(bounds['first'], bounds['last'] + 1, shard_size)]
+    cache.set_many({
+        progress_key(fanout_id, 'shards'): len(shards),
+        progress_key(fanout_id, 'done'): 0,
+        progress_key(fanout_id, 'created'): 0,
+    }, PROGRESS_TIMEOUT)
+    if shards:
+        recipients = model._meta.label_lower, serialize_q(q)
+        fields = serialize_fields(fields)
+        tasks = group(fan_out_shard.s(fanout_id, recipients, first, last, fields) for first, last in shards)
+        transaction.on_commit(tasks.apply_async)
+    return fanout_id
+
+
+def add_progress(fanout_id, name, delta):
+    key = progress_key(fanout_id, name)
+    # the progress may have expired or been evicted since the fan-out started
+    cache.add(key, 0, PROGRESS_TIMEOUT)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+@shared_task
+def fan_out_shard(fanout_id, recipients, first, last, fields):
+    """
+    Inserts the notifications of a shard of a fan-out, one per recipient of
+    ``recipients``, the label of their model and their filter, whose primary
+    key is between ``first`` and ``last``.
+    """
+    batch_size = get_config()['BATCH_SIZE']
+    Notification = load_model('notifications', 'Notification')
+    label, q = recipients
+    pks = (
+        apps.get_model(label)._default_manager.filter(deserialize_q(q), pk__range=(first, last))
+        .order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    )
+    fields = deserialize_fields(fields)
+    created = len(bulk_notify((Notification(recipient_id=pk, **fields) for pk in pks), batch_size))
+    add_progress(fanout_id, 'created', created)
+    add_progress(fanout_id, 'done', 1)
+    return created
+
+
+def get_progress(fanout_id):
+    """
+    Returns the number of shards of a fan-out, how many are done and the
+    number of notifications created so far, or None for an unknown fan-out.
+    """
+    progress = cache.get_many([progress_key(fanout_id, name) for name in ('shards', 'done', 'created')])
+    if not progress:
+        return None
+    shards, done, created = (progress.get(progress_key(fanout_id, name), 0) for name in ('shards', 'done', 'created'))
+    return {'shards': shards, 'done': done, 'created': created, 'finished': done >= shards}
+
+
+@shared_task
+def reconcile_unread_counts_task(chunk_size=1000):
+    """
+    Recounts the cached unread counters of all the users, ``chunk_size`` users
+    at a time, meant to be scheduled with Celery beat. Returns the number of
+    counters fixed.
+    """
+    user_ids = get_user_model()._default_manager.order_by('pk').values_list('pk', flat=True).iterator(chunk_size)
+    return sum(counters.reconcile(chunk) for chunk in iter(lambda: list(islice(user_ids, chunk_size)), []))
+
+
+@shared_task
+def archive_notifications_task(batch_size=None):
+    """
+    Moves the read and deleted notifications older than
+    ``NOTIFICATIONS_CONFIG['ARCHIVE_AFTER_DAYS']`` to the archive table, then
+    deletes the archived ones older than ``PURGE_AFTER_DAYS`` unless it is None,
+    meant to be scheduled with Celery beat. Returns the number of notifications archived.
+    """
+    config, now = get_config(), timezone.now()
+    archived = retention.archive(now - timedelta(days=config['ARCHIVE_AFTER_DAYS']), batch_size)
+    if config['PURGE_AFTER_DAYS'] is not None:
+        retention.purge(now - timedelta(days=config['PURGE_AFTER_DAYS']), batch_size)
+    return archived
+
+
+@shared_task
+def send_digests_task(batch_size=None):
+    """
+    Emails the digests of the unread, unsent notifications, see
+    ``notifications.digests.send_digests``, meant to be scheduled with Celery
+    beat. Returns the number of digests sent.
+    """
+    return digests.send_digests(batch_size)
+
+
+@shared_task
+def flush_pushes_task(user_ids):
+    """
+    Ends the coalescing windows of pushes, see ``notifications.push.flush``.
+    """
+    push.flush(user_ids)
@@ -1,3 +1,413 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from celery import current_app
+from channels.testing import WebsocketCommunicator
+import json
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Group
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from swapper import load_model
+
+from notifications import push
+from notifications.counters import unread_key
+from notifications.consumers import NotificationConsumer
+from notifications.helpers import notification_to_dict
+from notifications.models import ArchivedNotification
+from notifications.signals import notify
+from notifications.utils import id2slug
+from notifications.tasks import (
+    archive_notifications_task, describe, deserialize_q, flush_pushes_task, get_progress, reconcile_unread_counts_task,
+    send_digests_task, serialize_q,
+)
+
+Notification = load_model('notifications', 'Notification')
+User = get_user_model()
+
+urlpatterns = [
+    path('notifications/', include('notifications.urls')),
+]
+
+
+class NotifyHandlerTestCase(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender')
+        self.users = User.objects.bulk_create([User(username='user%d' % i) for i in range(25)])
+        self.group = Group.objects.create(name='staff')
+        self.group.user_set.set(self.users)
+        ContentType.objects.get_for_models(User, Group)
+
+    def test_single_recipient(self):
+        notify.send(self.sender, recipient=self.users[0], verb='pinged', target=self.group)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.users[0])
+        self.assertEqual(notification.actor, self.sender)
+        self.assertEqual(notification.target, self.group)
+
+    @override_settings(NOTIFICATIONS_CONFIG={'BATCH_SIZE': 10})
+    def test_group_recipient(self):
+        # the group's users are read once and inserted 10 at a time
+        with self.assertNumQueries(4):
+            (_, notifications), = notify.send(self.sender, recipient=self.group, verb='pinged',
+                                              action_object=self.group, description='staff meeting')
+        self.assertEqual(len(notifications), 25)
+        self.assertSetEqual(
+            set(Notification.objects.values_list('recipient', flat=True)), {user.pk for user in self.users})
+        self.assertEqual(set(Notification.objects.values_list(
+            'verb', 'description', 'action_object_object_id', 'actor_object_id')),
+            {('pinged', 'staff meeting', str(self.group.pk), str(self.sender.pk))})
+
+    def test_queryset_and_list_recipients(self):
+        with self.assertNumQueries(2):
+            notify.send(self.sender, recipient=User.objects.filter(username__startswith='user1'), verb='pinged')
+        with self.assertNumQueries(1):
+            notify.send(self.sender, recipient=self.users[:3], verb='poked')
+        self.assertEqual(Notification.objects.filter(verb='pinged').count(), 11)
+        self.assertEqual(Notification.objects.filter(verb='poked').count(), 3)
+
+
+@override_settings(NOTIFICATIONS_CONFIG={'ASYNC_FANOUT': True, 'FANOUT_SHARD_SIZE': 10, 'BATCH_SIZE': 4},
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FanOutTestCase(NotifyHandlerTestCase):
+
+    def setUp(self):
+        super(FanOutTestCase, self).setUp()
+        self.addCleanup(setattr, current_app.conf, 'task_always_eager', current_app.conf.task_always_eager)
+        current_app.conf.task_always_eager = True
+
+    def test_group_recipient(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            (_, fanout_id), = notify.send(self.sender, recipient=self.group, verb='pinged', target=self.group)
+            self.assertFalse(Notification.objects.exists())
+        self.assertEqual(get_progress(fanout_id), {'shards': 3, 'done': 3, 'created': 25, 'finished': True})
+        self.assertSetEqual(
+            set(Notification.objects.values_list('recipient', flat=True)), {user.pk for user in self.users})
+        self.assertEqual(Notification.objects.filter(target_object_id=self.group.pk).count(), 25)
+
+    def test_queryset_and_list_recipients(self):
+        recipients = User.objects.filter(username__startswith='user1').exclude(username='user1')
+        with self.captureOnCommitCallbacks(execute=True):
+            (_, fanout_id), = notify.send(self.sender, recipient=recipients, verb='pinged')
+        self.assertEqual(get_progress(fanout_id)['created'], 10)
+        self.assertEqual(set(Notification.objects.values_list('recipient', flat=True)),
+                         set(recipients.values_list('pk', flat=True)))
+        # lists are still notified synchronously
+        notify.send(self.sender, recipient=self.users[:3], verb='poked', async_fanout=True)
+        self.assertEqual(Notification.objects.filter(verb='poked').count(), 3)
+        self.assertIsNone(get_progress('unknown'))
+
+    def test_undescribed_recipients(self):
+        # filtering across a join cannot be sent to the workers, the queryset is notified right away
+        recipients = User.objects.filter(groups=self.group, username__startswith='user1')
+        self.assertIsNone(describe(recipients))
+        notify.send(self.sender, recipient=recipients, verb='pinged')
+        self.assertEqual(Notification.objects.count(), 11)
+
+    def test_describe(self):
+        recipients = User.objects.filter(username__in=['user1', 'user2', 'user3']).exclude(username='user2')
+        q = deserialize_q(json.loads(json.dumps(serialize_q(describe(recipients)))))
+        self.assertQuerySetEqual(User.objects.filter(q).order_by('pk'), recipients.order_by('pk'))
+
+    def test_progress_evicted(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            (_, fanout_id), = notify.send(self.sender, recipient=self.group, verb='pinged')
+        cache.clear()
+        callbacks[0]()
+        self.assertEqual(Notification.objects.count(), 25)
+        self.assertEqual(get_progress(fanout_id)['created'], 25)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   NOTIFICATIONS_CONFIG={'SOFT_DELETE': True}, ROOT_URLCONF='notifications.tests')
+class UnreadCountTestCase(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender')
+        self.user = User.objects.create_user('user', password='user')
+        cache.clear()
+        self.client.login(username='user', password='user')
+
+    def unread_count(self):
+        return self.client.get(reverse('notifications:live_unread_notification_count')).json()['unread_count']
+
+    def test_counter(self):
+        self.assertEqual(self.unread_count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                notify.send(self.sender, recipient=self.user, verb='pinged')
+        with self.assertNumQueries(2):  # session and user
+            self.assertEqual(self.unread_count(), 3)
+
+        first, second, third = self.user.notifications.all()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.mark_as_read()
+        self.assertEqual(self.unread_count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.mark_as_unread()
+            Notification.objects.filter(pk=second.pk).mark_all_as_deleted()
+        self.assertEqual(self.unread_count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('notifications:delete', args=[third.slug]))
+        self.assertEqual(self.unread_count(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.mark_all_as_active(self.user)
+        self.assertEqual(self.unread_count(), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.notifications.mark_all_as_read()
+        self.assertEqual(self.unread_count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notify.send(self.sender, recipient=[self.user], verb='pinged')
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_counter_on_commit(self):
+        self.assertEqual(self.unread_count(), 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            notify.send(self.sender, recipient=self.user, verb='pinged')
+        # not counted until the notification is committed
+        self.assertEqual(cache.get(unread_key(self.user.pk)), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(unread_key(self.user.pk)), 1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    self.user.notifications.get().mark_as_read()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_reconcile(self):
+        notify.send(self.sender, recipient=self.user, verb='pinged')
+        self.assertEqual(self.unread_count(), 1)
+        Notification.objects.update(unread=False)
+        self.assertEqual(self.unread_count(), 1)
+        self.assertEqual(reconcile_unread_counts_task(), 1)
+        self.assertEqual(self.unread_count(), 0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class PushTestCase(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.sender = User.objects.create_user('sender')
+        self.users = [User.objects.create_user('user%d' % i) for i in range(3)]
+        self.group = Group.objects.create(name='staff')
+        self.group.user_set.set(self.users)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notifications/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unread_count', 'unread_count': 0})
+        return communicator
+
+    async def test_push(self):
+        first, second = await self.connect(self.users[0]), await self.connect(self.users[1])
+
+        await sync_to_async(notify.send)(self.sender, recipient=self.users[0], verb='pinged')
+        event = await first.receive_json_from()
+        self.assertEqual((event['type'], event['notification']['verb']), ('notification', 'pinged'))
+        self.assertTrue(await second.receive_nothing())
+
+        # bursts are coalesced into one event per connected user and window
+        with patch.object(flush_pushes_task, 'apply_async') as schedule:
+            for verb in ('pinged', 'poked', 'prodded'):
+                await sync_to_async(notify.send)(self.sender, recipient=self.group, verb=verb)
+            for communicator in (first, second):
+                self.assertEqual(await communicator.receive_json_from(), {'type': 'changed', 'count': 1})
+                self.assertTrue(await communicator.receive_nothing())
+            (user_ids,), = schedule.call_args.args
+            self.assertEqual(sorted(user_ids), [self.users[0].pk, self.users[1].pk])
+
+            # the end of the window announces the rest, then closes it
+            await sync_to_async(flush_pushes_task)(user_ids)
+            for communicator in (first, second):
+                self.assertEqual(await communicator.receive_json_from(), {'type': 'changed', 'count': 2})
+            await sync_to_async(flush_pushes_task)(user_ids)
+            for communicator in (first, second):
+                self.assertTrue(await communicator.receive_nothing())
+                await communicator.disconnect()
+        self.assertEqual(schedule.call_count, 2)
+        self.assertEqual(push.online([user.pk for user in self.users]), [])
+
+    async def test_anonymous(self):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notifications/')
+        communicator.scope['user'] = AnonymousUser()
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   ROOT_URLCONF='notifications.tests')
+class NotificationListTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.sender = User.objects.create_user('sender')
+        self.user = User.objects.create_user('user', password='user')
+        self.group = Group.objects.create(name='staff')
+        self.client.login(username='user', password='user')
+        ContentType.objects.get_for_models(User, Group)
+
+    def notify(self, count):
+        for i in range(count):
+            notify.send(self.sender, recipient=self.user, verb='pinged %d' % i,
+                        target=self.group, action_object=self.user)
+
+    def get_list(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('notifications:live_unread_notification_list'), params)
+        return response.json()['unread_list'], len(context)
+
+    def test_same_shape(self):
+        self.notify(3)
+        expected = [notification_to_dict(notification) for notification in self.user.notifications.unread()]
+        notifications, _ = self.get_list()
+        self.assertEqual(notifications, json.loads(json.dumps(expected, cls=DjangoJSONEncoder)))
+
+    def test_queries(self):
+        self.notify(2)
+        self.get_list()  # caches the unread count
+        few, few_queries = self.get_list()
+        self.notify(8)
+        many, many_queries = self.get_list()
+        self.assertEqual((len(few), len(many)), (2, 10))
+        # session, user, page and one query per content type
+        self.assertEqual(few_queries, many_queries)
+        self.assertLessEqual(few_queries, 5)
+        _, marking_queries = self.get_list(mark_as_read='true')
+        # the counts per recipient and a single update
+        self.assertEqual(marking_queries, many_queries + 2)
+        self.assertFalse(self.user.notifications.unread().exists())
+        self.assertEqual(self.get_list()[0], [])
+
+
+@override_settings(NOTIFICATIONS_CONFIG={'SOFT_DELETE': True, 'ARCHIVE_AFTER_DAYS': 30, 'PURGE_AFTER_DAYS': 60})
+class RetentionTestCase(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender')
+        self.user = User.objects.create_user('user')
+
+    def notify(self, days, **fields):
+        notification, = notify.send(
+            self.sender, recipient=self.user, verb='pinged', timestamp=timezone.now() - timedelta(days=days))[0][1]
+        Notification.objects.filter(pk=notification.pk).update(**fields)
+        return notification.pk
+
+    def test_archive(self):
+        read, deleted = self.notify(40, unread=False), self.notify(40, deleted=True)
+        unread, recent, purged = self.notify(40), self.notify(10, unread=False), self.notify(70, unread=False)
+        # the batches of 2 and 1 (savepoint, select, insert, the rows deleted for the signals, delete, release),
+        # the empty one and the purge
+        with self.assertNumQueries(19):
+            self.assertEqual(archive_notifications_task(batch_size=2), 3)
+        self.assertSetEqual(set(Notification.objects.values_list('pk', flat=True)), {unread, recent})
+        self.assertSetEqual(set(ArchivedNotification.objects.values_list('pk', flat=True)), {read, deleted})
+        self.assertQuerySetEqual(self.user.archived_notifications.filter(pk=read), ['pinged'], lambda n: n.verb)
+        self.assertFalse(ArchivedNotification.objects.filter(pk=purged).exists())
+        self.assertEqual(archive_notifications_task(), 0)
+
+    def test_archive_conflict(self):
+        read = self.notify(40, unread=False)
+        fields = [field.attname for field in ArchivedNotification._meta.concrete_fields]
+        ArchivedNotification.objects.create(**Notification.objects.filter(pk=read).values(*fields).get())
+        with self.assertRaises(IntegrityError):
+            archive_notifications_task()
+        self.assertTrue(Notification.objects.filter(pk=read).exists())
+
+
+@override_settings(NOTIFICATIONS_CONFIG={'SOFT_DELETE': True, 'DIGEST_MAX_ITEMS': 2})
+class DigestTestCase(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender')
+        self.users = [User.objects.create_user('user%d' % i, email='user%d@example.com' % i) for i in range(3)]
+        self.users.append(User.objects.create_user('noemail'))
+
+    def test_digests(self):
+        for i in range(3):
+            notify.send(self.sender, recipient=self.users, verb='pinged %d' % i)
+        self.users[1].notifications.mark_all_as_read()
+        ContentType.objects.get_for_models(User)
+        # per batch: recipients, counts, latest notifications, actors and the update, then the empty batch
+        with self.assertNumQueries(11):
+            self.assertEqual(send_digests_task(batch_size=2), 2)
+        self.assertEqual([message.to for message in mail.outbox], [['user0@example.com'], ['user2@example.com']])
+        self.assertEqual(mail.outbox[0].subject, '3 new notifications')
+        self.assertIn('sender pinged 2', mail.outbox[0].body)
+        self.assertIn('and 1 more.', mail.outbox[0].body)
+        self.assertNotIn('sender pinged 0', mail.outbox[0].body)
+        self.assertFalse(Notification.objects.unsent().unread().exists())
+
+        notify.send(self.sender, recipient=self.users[0], verb='pinged')
+        self.assertEqual(send_digests_task(), 1)
+        self.assertEqual(mail.outbox[-1].subject, '1 new notification')
+
+
+@override_settings(ROOT_URLCONF='notifications.tests')
+class NotificationAPITestCase(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user('sender')
+        self.user = User.objects.create_user('user')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        # two notifications share a timestamp to check the tie-breaking on id
+        for minutes in (5, 4, 4, 3, 2):
+            notify.send(self.sender, recipient=self.user, verb='pinged', target=self.user,
+                        timestamp=now - timedelta(minutes=minutes))
+        self.slugs = [id2slug(pk) for pk in self.user.notifications.order_by('-timestamp', '-id').values_list('id', flat=True)]
+        ContentType.objects.get_for_models(User)
+
+    def get(self, url=None, **params):
+        return self.client.get(url or reverse('notifications:notification-list'), params).json()
+
+    def test_pages(self):
+        slugs, url = [], None
+        with self.assertNumQueries(5):  # session, user, page, actors and targets
+            page = self.get(page_size=2)
+        latest = page['latest']
+        with self.assertNumQueries(5):
+            self.get(page['next'])
+        while True:
+            slugs.extend(notification['slug'] for notification in page['results'])
+            self.assertEqual(page['latest'], latest)
+            url = page['next']
+            if not url:
+                break
+            page = self.get(url)
+        self.assertEqual(slugs, self.slugs)
+
+        first = self.get(page_size=2)['results'][0]
+        self.assertEqual(set(first), {'slug', 'level', 'verb', 'unread', 'timestamp', 'actor', 'target'})
+        self.assertEqual(first['actor'], {'type': User._meta.label_lower, 'id': str(self.sender.pk), 'name': 'sender'})
+
+    def test_since_until(self):
+        latest = self.get(page_size=2)['latest']
+        self.assertEqual(self.get(since=latest), {'next': None, 'latest': latest, 'results': []})
+        notify.send(self.sender, recipient=self.user, verb='pinged again')
+        page = self.get(since=latest)
+        self.assertEqual([notification['verb'] for notification in page['results']], ['pinged again'])
+        self.assertNotEqual(page['latest'], latest)
+
+        until = self.user.notifications.order_by('-timestamp')[2].timestamp.isoformat()
+        self.assertEqual([n['slug'] for n in self.get(until=until)['results']], self.slugs[1:])
+        self.assertEqual(self.client.get(reverse('notifications:notification-list'), {'since': 'nope'}).status_code, 400)
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from . import views
-from django.urls import re_path as pattern
+from django.urls import include, re_path as pattern
 
 
 
@@ -17,6 +17,7 @@ urlpatterns = [
     pattern(r'^api/all_count/$', views.live_all_notification_count, name='live_all_notification_count'),
     pattern(r'^api/unread_list/$', views.live_unread_notification_list, name='live_unread_notification_list'),
     pattern(r'^api/all_list/', views.live_all_notification_list, name='live_all_notification_list'),
+    pattern(r'^api/', include('notifications.drf.urls')),
 ]
 
 app_name = 'notifications'
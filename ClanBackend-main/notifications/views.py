@@ -12,7 +12,7 @@ from django.views.decorators.cache import never_cache
 from django.views.generic import ListView
 from swapper import load_model
 
-from notifications import settings as notification_settings
+from notifications import counters, settings as notification_settings
 from notifications.helpers import get_notification_list
 from notifications.utils import slug2id
 
@@ -101,6 +101,8 @@ def delete(request, slug=None):
     notification = get_object_or_404(
         Notification, recipient=request.user, id=notification_id)
 
+    if notification.unread and not notification.deleted:
+        counters.adjust({notification.recipient_id: -1})
     if notification_settings.get_config()['SOFT_DELETE']:
         notification.deleted = True
         notification.save()
@@ -128,7 +130,7 @@ def live_unread_notification_count(request):
         }
     else:
         data = {
-            'unread_count': request.user.notifications.unread().count(),
+            'unread_count': counters.get_unread_count(request.user),
         }
     return JsonResponse(data)
 
@@ -151,7 +153,7 @@ def live_unread_notification_list(request):
     unread_list = get_notification_list(request, 'unread')
 
     data = {
-        'unread_count': request.user.notifications.unread().count(),
+        'unread_count': counters.get_unread_count(request.user),
         'unread_list': unread_list
     }
     return JsonResponse(data)